@@ -0,0 +1,3 @@
+"""
+Benchmarks for wiske, see __main__.py.
+"""
@@ -0,0 +1,261 @@
+"""
+Benchmarks for the render path, run with `python -m bench`. By default this uses a synthetic
+soundfont (see synthetic.py), so results only depend on the code and the machine. Pass
+`--json` to save the results for comparing between versions.
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from wiske import OfflineRenderer, EventNoteOn, EventNoteOff
+from wiske.interface import AudioConfig, NullSink
+from wiske.sf2.soundfont import Soundfont
+
+from .synthetic import write_soundfont
+
+
+WARMUP_PERIODS = 20
+FIRST_KEY = 36
+
+
+@contextlib.contextmanager
+def quiet():
+    # Keep anything the synth prints out of the results
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def percentile(values, pct):
+    return float(np.percentile(values, pct)) if values else 0
+
+
+def make_renderer(sfont, period_size, voices, workers=0):
+    cfg = AudioConfig(period_size=period_size, sink=NullSink())
+    return OfflineRenderer(sfont, cfg, max_polyphony=max(voices, 1), workers=workers)
+
+
+def bench_load(path, repeats):
+    """
+    Time taken to load the soundfont, and then to play its first note, which is when the
+    preset's zones get resolved.
+    """
+    loads = []
+    first_notes = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        sfont = Soundfont(path)
+        loads.append(time.perf_counter() - start)
+
+        renderer = make_renderer(sfont, 128, 1)
+        instrument = renderer.new_instrument(0, 0)
+        start = time.perf_counter()
+        instrument.send_event(EventNoteOn(60, 100))
+        renderer.interface.handle_messages()
+        first_notes.append(time.perf_counter() - start)
+
+    return {
+        "load_time": statistics.median(loads),
+        "first_note_time": statistics.median(first_notes),
+    }
+
+
+def bench_note_on(sfont, period_size, notes):
+    """
+    Time from sending a note on to the mixer having started the voice, both the first time a
+    key is played (nothing cached) and after that.
+    """
+    renderer = make_renderer(sfont, period_size, 1)
+    instrument = renderer.new_instrument(0, 0)
+    mixer = renderer.interface
+
+    cold = []
+    warm = []
+    for i in range(notes):
+        key = FIRST_KEY + i % 72
+        start = time.perf_counter()
+        instrument.send_event(EventNoteOn(key, 100))
+        mixer.handle_messages()
+        (cold if i < 72 else warm).append(time.perf_counter() - start)
+        instrument.send_event(EventNoteOff(key))
+
+    return {
+        "cold_median": statistics.median(cold),
+        "warm_median": statistics.median(warm) if warm else None,
+        "warm_p99": percentile(warm, 99),
+    }
+
+
+def bench_render(sfont, period_size, voices, periods, workers=0):
+    """
+    Mix `periods` periods with `voices` notes held down, using `workers` processes if given.
+    """
+    renderer = make_renderer(sfont, period_size, voices, workers)
+    instrument = renderer.new_instrument(0, 0)
+    mixer = renderer.interface
+    for i in range(voices):
+        instrument.send_event(EventNoteOn(FIRST_KEY + i % 72, 64 + i % 64))
+
+    for _ in range(WARMUP_PERIODS):
+        mixer.mix_period()
+
+    times = []
+    perf_counter = time.perf_counter
+    total_start = perf_counter()
+    for _ in range(periods):
+        start = perf_counter()
+        mixer.mix_period()
+        times.append(perf_counter() - start)
+    elapsed = perf_counter() - total_start
+    live = mixer.live_count + (mixer.workers.live_count if mixer.workers is not None else 0)
+    renderer.close()
+
+    audio_secs = periods * period_size / renderer.cfg.sample_rate
+    realtime = audio_secs / elapsed
+    return {
+        "voices": voices,
+        "workers": workers,
+        "live_voices": live,
+        "periods": periods,
+        "elapsed": elapsed,
+        "mean_period_time": elapsed / periods,
+        "p99_period_time": percentile(times, 99),
+        "max_period_time": max(times),
+        "deadline": renderer.cfg.period_length,
+        "realtime_factor": realtime,
+        "voices_per_realtime": voices * realtime,
+    }
+
+
+def bench_reference(sfont, period_size, periods):
+    """
+    A single note through the per-sample reference implementation `Note.collect` and through
+    `Note.collect_block`, which is what the mixer uses.
+    """
+    renderer = make_renderer(sfont, period_size, 1)
+    instrument = renderer.new_instrument(0, 0)
+    prototype = instrument.resolve_note(60, 100)
+    words = period_size * renderer.cfg.channels
+
+    results = {}
+    for label in ("collect", "collect_block"):
+        note = prototype.spawn(renderer.interface)
+        note.play()
+        collect = getattr(note, label)
+        start = time.perf_counter()
+        for _ in range(periods):
+            block = collect(words, True)
+            if label == "collect":
+                block = list(block)
+        results[label] = (time.perf_counter() - start) / periods
+
+    results["speedup"] = results["collect"] / results["collect_block"]
+    return results
+
+
+def bench_memory(path, period_size, voices, periods):
+    """
+    Peak memory allocated while loading the soundfont and rendering with `voices` voices.
+    """
+    gc.collect()
+    tracemalloc.start()
+    sfont = Soundfont(path)
+    bench_render(sfont, period_size, voices, periods)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # ru_maxrss is in kilobytes on Linux
+    return {
+        "traced_peak_bytes": peak,
+        "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+
+def environment():
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmark the wiske render path")
+    parser.add_argument("--sf2", help="soundfont to use, instead of a synthetic one")
+    parser.add_argument("--voices", default="1,8,32,64", help="comma separated voice counts to render")
+    parser.add_argument("--periods", type=int, default=500, help="periods to render for each voice count")
+    parser.add_argument("--period-size", type=int, default=128, help="frames per period")
+    parser.add_argument("--notes", type=int, default=500, help="note ons to time")
+    parser.add_argument("--workers", type=int, default=0, help="also render with this many worker processes")
+    parser.add_argument("--stereo", action="store_true", help="make the synthetic soundfont's samples stereo pairs")
+    parser.add_argument("--json", help="write results to this file, or - for stdout")
+    args = parser.parse_args()
+
+    voice_counts = [int(x) for x in args.voices.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp, quiet():
+        path = args.sf2
+        if path is None:
+            path = os.path.join(tmp, "synthetic.sf2")
+            write_soundfont(path, stereo=args.stereo)
+
+        sfont = Soundfont(path)
+        results = {
+            "environment": environment(),
+            "config": {
+                "soundfont": args.sf2 or ("synthetic stereo" if args.stereo else "synthetic"),
+                "period_size": args.period_size,
+                "periods": args.periods,
+            },
+            "load": bench_load(path, 5),
+            "note_on": bench_note_on(sfont, args.period_size, args.notes),
+            "reference": bench_reference(sfont, args.period_size, 50),
+            "render": [bench_render(sfont, args.period_size, n, args.periods) for n in voice_counts],
+            "parallel": [
+                bench_render(sfont, args.period_size, n, args.periods, args.workers) for n in voice_counts
+            ] if args.workers else [],
+            "memory": bench_memory(path, args.period_size, max(voice_counts), min(args.periods, 100)),
+        }
+
+    print("Load: {:.2f}ms, first note {:.2f}ms".format(
+        results["load"]["load_time"] * 1e3, results["load"]["first_note_time"] * 1e3
+    ))
+    print("Note on: {:.1f}us uncached, {:.1f}us cached (p99 {:.1f}us)".format(
+        results["note_on"]["cold_median"] * 1e6, (results["note_on"]["warm_median"] or 0) * 1e6,
+        results["note_on"]["warm_p99"] * 1e6
+    ))
+    print("Note.collect {:.1f}us, collect_block {:.1f}us per period ({:.1f}x)".format(
+        results["reference"]["collect"] * 1e6, results["reference"]["collect_block"] * 1e6, results["reference"]["speedup"]
+    ))
+    for r in results["render"] + results["parallel"]:
+        print("{:4d} voices, {} workers: {:7.1f}us per period (p99 {:7.1f}us, deadline {:.1f}us), {:6.1f}x realtime, {:7.1f} voices per realtime".format(
+            r["voices"], r["workers"], r["mean_period_time"] * 1e6, r["p99_period_time"] * 1e6, r["deadline"] * 1e6,
+            r["realtime_factor"], r["voices_per_realtime"]
+        ))
+    print("Memory: {:.1f}MiB peak traced, {:.1f}MiB max RSS".format(
+        results["memory"]["traced_peak_bytes"] / 2 ** 20, results["memory"]["max_rss_bytes"] / 2 ** 20
+    ))
+
+    if args.json == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    elif args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
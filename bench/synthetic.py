@@ -0,0 +1,116 @@
+"""
+Writes small soundfonts made up of sine waves, so benchmarks don't depend on having a real
+soundfont lying around.
+"""
+
+import struct
+from math import sin, pi
+
+from wiske.sf2.definitions import SFGenerator, SFSampleLink
+
+
+SAMPLE_RATE = 44100
+SAMPLE_PADDING = 46     # Soundfont 2.01 spec, 7.10: at least 46 zero samples after each sample
+LOOP_MARGIN = 100
+
+
+def chunk(ident, data):
+    # RIFF chunks are padded to an even length
+    if len(data) % 2:
+        data += b"\0"
+    return ident + struct.pack("<I", len(data)) + data
+
+
+def list_chunk(kind, *chunks):
+    return chunk(b"LIST", kind + b"".join(chunks))
+
+
+def name(text):
+    return text.encode("ascii")[:19].ljust(20, b"\0")
+
+
+def gen(generator, amount):
+    # Soundfont 2.01 spec, 7.5: ranges are two bytes, everything else a 16-bit word
+    if isinstance(amount, tuple):
+        return struct.pack("<HBB", generator.value, amount[0], amount[1])
+    return struct.pack("<Hh", generator.value, amount)
+
+
+def sine(length, pitch, level):
+    period = SAMPLE_RATE / (440 * 2 ** ((pitch - 69) / 12))
+    return [int(level * sin(2 * pi * i / period)) for i in range(length)]
+
+
+def write_soundfont(path, zones=4, length=4410, stereo=False):
+    """
+    Write a soundfont with a single preset (bank 0, number 0) and instrument, split into
+    `zones` looping sine wave samples spread across the keyboard, each `length` frames long.
+    If `stereo` is set, every zone is a linked left and right pair, panned apart.
+    """
+    smpl = b""
+    headers = []    # (start, end, pitch, sample type, linked sample)
+    channels = [(SFSampleLink.monoSample, 0, 1)]
+    if stereo:
+        channels = [(SFSampleLink.leftSample, 1, 1), (SFSampleLink.rightSample, -1, 0.5)]
+
+    for z in range(zones):
+        pitch = 36 + z * 24
+        for sample_type, link, level in channels:
+            start = len(smpl) // 2
+            smpl += struct.pack("<{}h".format(length), *sine(length, pitch, 8000 * level))
+            smpl += b"\0" * (SAMPLE_PADDING * 2)
+            headers.append((start, start + length, pitch, sample_type, len(headers) + link if stereo else 0))
+
+    # Soundfont 2.01 spec, 7.10
+    shdr = b""
+    for i, (start, end, pitch, sample_type, link) in enumerate(headers):
+        shdr += name("s{}".format(i)) + struct.pack(
+            "<IIIIIBbHH", start, end, start + LOOP_MARGIN, end - LOOP_MARGIN, SAMPLE_RATE, pitch, 0, link, sample_type.value
+        )
+    shdr += name("EOS") + b"\0" * 26
+
+    # Instrument: a global zone with the envelope, then one zone per sample
+    igen = b""
+    ibag = b""
+    gens = 0
+    zone_gens = [[
+        gen(SFGenerator.attackVolEnv, -3000),
+        gen(SFGenerator.decayVolEnv, -1200),
+        gen(SFGenerator.sustainVolEnv, 100),
+        gen(SFGenerator.releaseVolEnv, -2000),
+    ]]
+    for i, (start, end, pitch, sample_type, link) in enumerate(headers):
+        low = 0 if pitch == 36 else pitch - 24
+        high = 127 if pitch == 36 + (zones - 1) * 24 else pitch + 23
+        this_zone = [gen(SFGenerator.keyRange, (low, high)), gen(SFGenerator.sampleModes, 1)]
+        if stereo:
+            this_zone.append(gen(SFGenerator.pan, -500 if sample_type == SFSampleLink.leftSample else 500))
+        this_zone.append(gen(SFGenerator.sampleID, i))  # must be last, 8.1.2
+        zone_gens.append(this_zone)
+
+    for this_zone in zone_gens:
+        ibag += struct.pack("<HH", gens, 0)
+        igen += b"".join(this_zone)
+        gens += len(this_zone)
+    ibag += struct.pack("<HH", gens, 0)
+    igen += b"\0" * 4
+    inst = name("Instrument") + struct.pack("<H", 0) + name("EOI") + struct.pack("<H", len(zone_gens))
+
+    # Preset with a single zone pointing at the instrument
+    pgen = gen(SFGenerator.instrument, 0) + b"\0" * 4
+    pbag = struct.pack("<HH", 0, 0) + struct.pack("<HH", 1, 0)
+    phdr = name("Preset") + struct.pack("<HHHIII", 0, 0, 0, 0, 0, 0) + name("EOP") + struct.pack("<HHHIII", 0, 0, 1, 0, 0, 0)
+
+    info = list_chunk(b"INFO",
+        chunk(b"ifil", struct.pack("<HH", 2, 1)),
+        chunk(b"isng", b"EMU8000\0"),
+        chunk(b"INAM", b"Synthetic\0"),
+    )
+    sdta = list_chunk(b"sdta", chunk(b"smpl", smpl))
+    pdta = list_chunk(b"pdta",
+        chunk(b"phdr", phdr), chunk(b"pbag", pbag), chunk(b"pmod", b"\0" * 10), chunk(b"pgen", pgen),
+        chunk(b"inst", inst), chunk(b"ibag", ibag), chunk(b"imod", b"\0" * 10), chunk(b"igen", igen),
+        chunk(b"shdr", shdr),
+    )
+    with open(path, "wb") as f:
+        f.write(chunk(b"RIFF", b"sfbk" + info + sdta + pdta))
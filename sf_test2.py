@@ -119,28 +119,30 @@ MUSIC = [
 ]
 
 
+# Events are scheduled for the exact frame they should play at, a little ahead of time, so
+# they aren't at the mercy of time.sleep
+LEAD = 0.2
+GAP = 0.05
+rate = synth.interface.cfg.sample_rate
+start_frame = synth.interface.frame + int(LEAD * rate)
+start_time = time.time()
+beat_time = 0
+
 for note in MUSIC:
-    if note[0] is None:
-        time.sleep(note[1])
-        continue
-    note_val = name_to_val(note[0])
-    inst.send_event(EventNoteOn(note_val + REPITCH, 100))
-    inst.send_event(EventNoteOn(note_val + REPITCH + 4, 100))
-    # inst.send_event(EventNoteOn(note_val + REPITCH + 7, 100))
-
-    if SUSTAIN:
-        time.sleep(note[1] - 0.05)
-    else:
-        time.sleep(0.01)
-
-    inst.send_event(EventNoteOff(note_val + REPITCH))
-    inst.send_event(EventNoteOff(note_val + REPITCH + 4))
-    # inst.send_event(EventNoteOff(note_val + REPITCH + 7))
-
-    if SUSTAIN:
-        time.sleep(0.05)
-    else:
-        time.sleep(note[1] - 0.01)
+    if note[0] is not None:
+        note_val = name_to_val(note[0])
+        on_frame = start_frame + round(beat_time * rate)
+        if SUSTAIN:
+            off_frame = on_frame + round((note[1] - GAP) * rate)
+        else:
+            off_frame = on_frame + round(0.01 * rate)
+
+        for interval in (0, 4):
+            inst.send_event(EventNoteOn(note_val + REPITCH + interval, 100), on_frame)
+            inst.send_event(EventNoteOff(note_val + REPITCH + interval), off_frame)
+
+    beat_time += note[1]
+    time.sleep(max(0, start_time + beat_time - time.time()))
 
 input()
 synth.halt()
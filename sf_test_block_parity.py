@@ -0,0 +1,149 @@
+"""
+Checks that the block renderer (Note.collect_block) produces the same output as the per-sample
+reference implementation (Note.collect). Doesn't need a soundfont or a sound card.
+"""
+
+from math import sin, pi
+
+import numpy as np
+
+from wiske.note import Note
+from wiske.interface import AudioConfig, NullSink
+from wiske.interpolation import Interpolation
+from wiske.sf2.sample import Sample
+from wiske.sf2.convertors import secs_to_timecents
+from wiske.sf2.definitions import SFGenerator, SFSampleLink, sampleModes
+from wiske.sf2.defaults import SF_GEN_DEFAULTS, DEFAULT_MODULATORS
+
+
+PERIOD = 256        # words, i.e. 128 stereo frames
+PERIODS = 300
+RELEASE_AT = 200
+TOLERANCE = 1e-3    # on the 16-bit scale
+LOOP = (1000, 3800)
+
+
+class DummyInterface:
+    def __init__(self, interpolation=Interpolation.LINEAR):
+        self.cfg = AudioConfig(sink=NullSink(), interpolation=interpolation)
+
+    def add_custom_buffer(self, custom_buf, collect_func):
+        return 1
+
+    def end_loop(self, buffer_id):
+        pass
+
+
+def make_sample(sample_rate, sample_type=SFSampleLink.monoSample, harmonic=37, loop=LOOP):
+    length = 4000
+    data = [int(12000 * sin(2 * pi * 5 * i / 400) + 3000 * sin(2 * pi * i / harmonic)) for i in range(length)]
+    return Sample("parity", np.array(data, dtype=np.int16), loop, sample_rate, 60, 0, sample_type)
+
+
+def make_gens(loop_type):
+    gens = {}
+    for gen in SF_GEN_DEFAULTS:
+        gens[gen] = SF_GEN_DEFAULTS[gen]
+    gens[SFGenerator.sampleModes] = sampleModes(loop_type)
+    gens[SFGenerator.attackVolEnv] = secs_to_timecents(0.02)
+    gens[SFGenerator.holdVolEnv] = secs_to_timecents(0.01)
+    gens[SFGenerator.decayVolEnv] = secs_to_timecents(0.3)
+    gens[SFGenerator.sustainVolEnv] = 120
+    gens[SFGenerator.releaseVolEnv] = secs_to_timecents(0.2)
+    gens[SFGenerator.initialFilterFc] = 9000
+    return gens
+
+
+def check(key, vel, sample_rate, loop_type, stereo, loop=LOOP, interpolation=Interpolation.LINEAR, period_size=PERIOD,
+          end_loop_at=None):
+    inter = DummyInterface(interpolation)
+    link = None
+    gens = make_gens(loop_type)
+    if stereo:
+        # Not quite panned apart, so each half ends up in both outputs
+        sample = make_sample(sample_rate, SFSampleLink.leftSample, loop=loop)
+        link = (make_sample(sample_rate, SFSampleLink.rightSample, 23, loop), 300)
+        gens[SFGenerator.pan] = -200
+    else:
+        sample = make_sample(sample_rate, loop=loop)
+    reference = Note(inter, key, vel, sample, dict(gens), list(DEFAULT_MODULATORS), link)
+    block = Note(inter, key, vel, sample, dict(gens), list(DEFAULT_MODULATORS), link)
+    reference.play()
+    block.play()
+    looping = reference.loop is not None
+
+    worst = 0
+    for period in range(PERIODS):
+        if period == RELEASE_AT:
+            reference.stop()
+            block.stop()
+        if period == end_loop_at:
+            looping = False
+
+        expected = np.array(list(reference.collect(period_size, looping)))
+        actual = block.collect_block(period_size, looping)
+        if len(expected) != len(actual):
+            return "length mismatch in period {}: {} vs {}".format(period, len(expected), len(actual))
+        if len(expected):
+            worst = max(worst, np.abs(expected - actual).max())
+
+    if worst > TOLERANCE:
+        return "max difference {:.6f}".format(worst)
+    return None
+
+
+failures = 0
+for key in (36, 55, 60, 61, 72, 90, 110):
+    for vel in (20, 100, 127):
+        for sample_rate in (22050, 44100):
+            for loop_type in (0, 1):
+                for stereo in (False, True):
+                    problem = check(key, vel, sample_rate, loop_type, stereo)
+                    if problem is not None:
+                        failures += 1
+                        print("FAIL key {} vel {} fs {} loop type {}{}: {}".format(
+                            key, vel, sample_rate, loop_type, " stereo" if stereo else "", problem
+                        ))
+
+# Interpolation modes reading points either side, which have to wrap both ways round the loop.
+# Slow in the reference, so fewer notes.
+for interpolation in (Interpolation.HERMITE, Interpolation.SINC):
+    for key in (36, 61, 90):
+        for loop_type in (0, 1):
+            for stereo in (False, True):
+                problem = check(key, 100, 44100, loop_type, stereo, interpolation=interpolation)
+                if problem is not None:
+                    failures += 1
+                    print("FAIL key {} loop type {}{} interpolation {}: {}".format(
+                        key, loop_type, " stereo" if stereo else "", interpolation, problem
+                    ))
+
+# Loops with no length, which some soundfonts have, play as if there were no loop
+for key in (36, 60, 90):
+    for stereo in (False, True):
+        problem = check(key, 100, 44100, 1, stereo, (1000, 1000))
+        if problem is not None:
+            failures += 1
+            print("FAIL key {} zero length loop{}: {}".format(key, " stereo" if stereo else "", problem))
+
+# Loops shorter than the guard, loops too near the start for a full lead in, and loops ended
+# part way round, carrying on to the end of the sample
+for loop, end_loop_at in (((3700, 3720), None), ((10, 90), None), (LOOP, 50), (LOOP, 53)):
+    for interpolation in (Interpolation.LINEAR, Interpolation.SINC):
+        for stereo in (False, True):
+            problem = check(61, 100, 44100, 1, stereo, loop, interpolation, end_loop_at=end_loop_at)
+            if problem is not None:
+                failures += 1
+                print("FAIL loop {} ended at {} interpolation {}{}: {}".format(
+                    loop, end_loop_at, interpolation, " stereo" if stereo else "", problem
+                ))
+
+# Periods that the filter has to split into sub-blocks, with a short one at the end
+for key in (36, 90):
+    for stereo in (False, True):
+        problem = check(key, 20, 44100, 1, stereo, period_size=1000)
+        if problem is not None:
+            failures += 1
+            print("FAIL key {} long period{}: {}".format(key, " stereo" if stereo else "", problem))
+
+print("{} failures".format(failures))
@@ -0,0 +1,98 @@
+"""
+Checks that standard MIDI files are read with the right event times, and that broken tracks
+are reported as MidiReadException. Writes its own file, so doesn't need one to hand.
+"""
+
+import os
+import struct
+import tempfile
+
+from wiske.event import EventType
+from wiske.midi import read_midi_file, read_track, MidiReadException
+
+
+DIVISION = 96       # ticks per quarter note
+TOLERANCE = 1e-9    # seconds
+
+
+def chunk(ident, data):
+    return ident + struct.pack(">I", len(data)) + data
+
+
+def make_file():
+    track = bytes([
+        0x00, 0x90, 0x3C, 0x64,                     # note on C4 at 120bpm, the default tempo
+        0x60, 0x3C, 0x00,                           # running status note on, velocity 0
+        0x00, 0x40, 0x64,                           # running status note on E4
+        0x00, 0xFF, 0x51, 0x03, 0x0F, 0x42, 0x40,   # tempo change to 60bpm
+        0x60, 0x80, 0x40, 0x40,                     # note off E4, a quarter note later at 60bpm
+        0x30, 0xB1, 0x07, 0x64,                     # control change on channel 1
+        0x00, 0xFF, 0x2F, 0x00,                     # end of track
+    ])
+    return chunk(b"MThd", struct.pack(">HHh", 0, 1, DIVISION)) + chunk(b"MTrk", track)
+
+
+EXPECTED = [
+    (0.0, 0, EventType.NOTE_ON, 60),
+    (0.5, 0, EventType.NOTE_OFF, 60),
+    (0.5, 0, EventType.NOTE_ON, 64),
+    (1.5, 0, EventType.NOTE_OFF, 64),
+    (2.0, 1, EventType.CONTROL_CHANGE, 7),
+]
+
+
+def first_field(event):
+    if event.type == EventType.CONTROL_CHANGE:
+        return event.controller
+    return event.note
+
+
+def check_file():
+    fd, path = tempfile.mkstemp(suffix=".mid")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(make_file())
+        events = read_midi_file(path)
+    finally:
+        os.remove(path)
+
+    if len(events) != len(EXPECTED):
+        return "read {} events, expected {}".format(len(events), len(EXPECTED))
+    for (secs, channel, event), (e_secs, e_channel, e_type, e_field) in zip(events, EXPECTED):
+        if abs(secs - e_secs) > TOLERANCE or channel != e_channel or event.type != e_type \
+                or first_field(event) != e_field:
+            return "read {} {} {} at {}, expected {} {} {} at {}".format(
+                event.type, channel, first_field(event), secs, e_type, e_channel, e_field, e_secs
+            )
+    return None
+
+
+def check_broken(track):
+    try:
+        list(read_track(track))
+    except MidiReadException:
+        return None
+    except Exception as e:
+        return "raised {!r}".format(e)
+    return "read without complaint"
+
+
+failures = 0
+
+problem = check_file()
+if problem is not None:
+    failures += 1
+    print("FAIL reading file: {}".format(problem))
+
+for name, track in (
+    ("track ending after a delta time", b"\x00\x90\x3C\x64\x10"),
+    ("track ending inside a message", b"\x00\x90\x3C"),
+    ("track ending before a meta type", b"\x00\xFF"),
+    ("system common status", b"\x00\xF1\x00"),
+):
+    problem = check_broken(track)
+    if problem is not None:
+        failures += 1
+        print("FAIL {}: {}".format(name, problem))
+
+print("{} failures".format(failures))
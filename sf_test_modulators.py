@@ -0,0 +1,60 @@
+"""
+Checks that changing modulator inputs updates the generators they should, and ignores modulators
+linked to other modulators (which aren't supported), both when a note starts with a channel's
+inputs and while it plays. Doesn't need a soundfont or a sound card.
+"""
+
+import numpy as np
+
+from wiske.note import Note
+from wiske.interface import AudioConfig, NullSink
+from wiske.sf2.sample import Sample
+from wiske.sf2.modulator import Modulator
+from wiske.sf2.sfmodulator import SFModulator
+from wiske.sf2.definitions import SFSampleLink, SFTransform
+from wiske.sf2.defaults import SF_GEN_DEFAULTS, DEFAULT_MODULATORS
+
+
+UNDEFINED_CC = 20   # not read by any default modulator
+VOLUME = 7
+LINKED_DEST = 5     # the sixth modulator in the zone, rather than a generator
+
+
+class DummyInterface:
+    cfg = AudioConfig(sink=NullSink())
+
+
+def make_note():
+    sample = Sample("modulators", np.zeros(1000, dtype=np.int16), (100, 900), 44100, 60, 0, SFSampleLink.monoSample)
+    # CC20, linear, unipolar and positive
+    linked = Modulator(SFModulator(0x0080 | UNDEFINED_CC), LINKED_DEST, 1000, SFModulator(0), SFTransform(0))
+    return Note(DummyInterface(), 60, 100, sample, dict(SF_GEN_DEFAULTS), list(DEFAULT_MODULATORS) + [linked])
+
+
+failures = 0
+
+def check(name, passed):
+    global failures
+    if not passed:
+        failures += 1
+        print("FAIL {}".format(name))
+
+
+note = make_note()
+gens = dict(note.gens)
+try:
+    note.set_mod_inputs({UNDEFINED_CC: 100})
+    note.update_mod_input(UNDEFINED_CC, 30)
+    check("linked modulator leaves generators alone", note.gens == gens)
+except KeyError as e:
+    check("linked modulator raised KeyError {}".format(e), False)
+
+note = make_note()
+atten = note.atten
+note.set_mod_inputs({VOLUME: 64})
+check("volume set before playing attenuates", note.atten < atten and note.play_atten == note.atten)
+note.update_mod_input(VOLUME, 127)
+check("volume change while playing", abs(note.atten - atten) < 1e-9)
+check("volume change is smoothed", note.play_atten != note.atten)
+
+print("{} failures".format(failures))
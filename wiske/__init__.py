@@ -1,3 +1,6 @@
 from .instrument import Instrument
+from .channel import Channel
 from .event import *
 from .synthesizer import Synthesizer
+from .offline import OfflineRenderer
+from .midi_player import MidiPlayer
@@ -0,0 +1,141 @@
+"""
+Block-based voice rendering.
+
+Each function here does, for a whole period at once, one stage of what `Note.collect` does
+sample by sample. The per-sample generator is kept as the reference implementation; anything
+changed here should still match it (see sf_test_block_parity.py).
+"""
+
+import numpy as np
+
+from .envelope import EnvelopeStage
+
+
+EMPTY_BLOCK = np.zeros(0)
+
+# The low pass is solved a sub-block of this many samples at a time, so there's one small
+# response per alpha whatever the period size. Responses are cached per alpha, up to a total size.
+FILTER_BLOCK = 64
+FILTER_CACHE_BYTES = 8 << 20
+filter_cache = {}
+filter_cache_bytes = 0
+
+ramp = np.arange(0)
+
+
+def get_ramp(size):
+    global ramp
+    if len(ramp) < size:
+        ramp = np.arange(max(size, 2 * len(ramp)), dtype=np.float64)
+    return ramp[:size]
+
+
+def advance_positions(position, rate, frames, looping, loop_s, loop_e, end):
+    """
+    Returns the fractional sample position for each frame of the block, and the position to
+    carry over into the next block. Without a loop, the block is cut short at `end`.
+    """
+    steps = get_ramp(frames + 1) * rate
+    steps += position
+
+    if looping:
+        # The loop end is the first sample after the loop, so is the same as the loop start
+        if steps[-1] >= loop_e:
+            loop_len = loop_e - loop_s
+            excess = steps - loop_e
+            over = excess >= 0
+            steps[over] -= loop_len * (np.floor(excess[over] / loop_len) + 1)
+        return steps[:-1], steps[-1]
+
+    count = int(np.searchsorted(steps[:-1], end, side="left"))
+    return steps[:count], steps[count]
+
+
+def envelope_block(vol_env, frames, time_diff):
+    """
+    Advance `vol_env` by `frames` samples, returning the value of the envelope for each one.
+    Works a segment (delay, attack, ...) at a time rather than a sample at a time.
+    """
+    out = np.empty(frames)
+    phase, position, start_val, current_val, target_val, total_time = vol_env.get_init_vals()
+
+    k = 0
+    while k < frames:
+        if phase == EnvelopeStage.SUSTAIN or phase == EnvelopeStage.FINISHED:
+            out[k:] = current_val
+            break
+
+        out[k] = current_val
+        steps = frames - k
+
+        # Envelope position after each of the remaining samples
+        positions = np.full(steps + 1, time_diff)
+        positions[0] = position
+        np.cumsum(positions, out=positions)
+        positions = positions[1:]
+
+        crossing = int(np.searchsorted(positions, total_time, side="left"))
+        if crossing == steps:
+            segment = start_val + (target_val - start_val) * (positions / total_time)
+            out[k + 1:] = segment[:-1]
+            position = positions[-1]
+            current_val = segment[-1]
+            break
+
+        out[k + 1:k + 1 + crossing] = start_val + (target_val - start_val) * (positions[:crossing] / total_time)
+        start_val, target_val, total_time, phase = vol_env.next_phase()
+        current_val = start_val
+        position = 0
+        k += crossing + 1
+
+    vol_env.update_vals((phase, position, start_val, current_val, target_val, total_time))
+    return out
+
+
+def filter_response(alpha):
+    """
+    Closed form of the one pole low pass over a sub-block of `FILTER_BLOCK` samples: a lower
+    triangular matrix taking the sub-block's input to its output, and the weight of the previous
+    output on each sample. Shorter sub-blocks use the top left corner of both.
+    """
+    global filter_cache_bytes
+    response = filter_cache.get(alpha)
+    if response is not None:
+        return response
+
+    decay = 1 - alpha
+    powers = decay ** get_ramp(FILTER_BLOCK + 1)
+    lags = np.subtract.outer(np.arange(FILTER_BLOCK), np.arange(FILTER_BLOCK))
+    matrix = np.where(lags >= 0, alpha * powers[np.maximum(lags, 0)], 0)
+    carry = powers[1:]
+
+    size = matrix.nbytes + carry.nbytes
+    if filter_cache_bytes + size > FILTER_CACHE_BYTES:
+        filter_cache.clear()
+        filter_cache_bytes = 0
+    filter_cache_bytes += size
+    response = filter_cache[alpha] = (matrix, carry)
+    return response
+
+
+def one_pole_block(values, alpha, last):
+    """
+    Solve the low pass recurrence y[n] = alpha * x[n] + (1 - alpha) * y[n - 1] for a whole block,
+    as a matrix product per sub-block rather than a Python loop over every sample. For stereo,
+    `values` has a column per channel and `last` a value per channel.
+    """
+    matrix, carry = filter_response(alpha)
+    size = len(values)
+    out = np.empty(values.shape)
+    stereo = values.ndim > 1
+    for start in range(0, size, FILTER_BLOCK):
+        end = min(start + FILTER_BLOCK, size)
+        n = end - start
+        sub = matrix[:n, :n].dot(values[start:end])
+        if stereo:
+            sub += carry[:n, np.newaxis] * last
+        elif last:
+            sub += carry[:n] * last
+        out[start:end] = sub
+        last = sub[-1]
+    return out
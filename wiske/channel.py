@@ -0,0 +1,167 @@
+from .event import EventType
+from .sf2.definitions import SFGeneralController
+from .sf2.convertors import semitones_to_wheel_sens
+
+
+CHANNELS = 16
+DRUM_CHANNEL = 9    # channel 10, counting from 1
+DRUM_BANK = 128     # Soundfont 2.01 spec, 7.2: bank 128 is reserved for percussion
+
+# MIDI controller numbers
+BANK_SELECT = 0
+DATA_ENTRY = 6
+VOLUME = 7
+PAN = 10
+EXPRESSION = 11
+SUSTAIN = 64
+DATA_ENTRY_LSB = 38
+NRPN_LSB = 98
+NRPN_MSB = 99
+RPN_LSB = 100
+RPN_MSB = 101
+ALL_SOUND_OFF = 120
+RESET_CONTROLLERS = 121
+ALL_NOTES_OFF = 123
+
+RPN_PITCH_BEND_RANGE = (0, 0)
+DEFAULT_BEND_RANGE = 2      # semitones
+BEND_CENTRE = 8192
+
+# General MIDI defaults for controllers that don't start at 0
+CONTROLLER_DEFAULTS = {
+    VOLUME: 100,
+    PAN: 64,
+    EXPRESSION: 127,
+}
+
+# Controllers that "reset all controllers" leaves alone (General MIDI RP-015)
+NOT_RESET = (BANK_SELECT, VOLUME, PAN) + tuple(range(91, 128))
+
+
+class Channel:
+    """
+    A MIDI channel, which plays notes on whichever preset its last bank and program change
+    picked. An `Instrument` is kept for every preset the channel has used, so program changes
+    only cost a dict lookup. Notes belong to the channel rather than the instrument, so a note
+    carries on after a program change until the channel releases it, and controllers keep
+    affecting it.
+    """
+    def __init__(self, parent, number, bank=0, program=0):
+        self.parent = parent
+        self.number = number
+        self.is_drums = number % CHANNELS == DRUM_CHANNEL
+        self.instruments = {}
+        self.bank = DRUM_BANK if self.is_drums else bank
+        self.program = program
+        self.instrument = None
+        self.select(self.bank, program)
+
+        self.rpn = None     # (MSB, LSB) of the selected registered parameter
+        self.bend_range = [DEFAULT_BEND_RANGE, 0]   # semitones, cents
+
+        # Keys released while the sustain pedal is down, which are released when it comes up
+        self.sustain = False
+        self.held = set()
+
+        # The value of every modulator input (see `Note.set_mod_inputs`) the channel controls.
+        # Each note starts with these, and changes to them are sent to every note playing.
+        self.mod_inputs = {controller: CONTROLLER_DEFAULTS.get(controller, 0) for controller in range(128)}
+        self.mod_inputs[SFGeneralController.channelPressure] = 0
+        self.mod_inputs[SFGeneralController.pitchWheel] = BEND_CENTRE / 128
+        self.mod_inputs[SFGeneralController.pitchWheelSens] = semitones_to_wheel_sens(DEFAULT_BEND_RANGE)
+
+    @property
+    def preset(self):
+        return self.instrument.preset
+
+    def select(self, bank, program):
+        """
+        Switch to the preset at `bank` and `program`. Like most synths, this falls back to the
+        same program in the default bank if there isn't one, and to the standard kit for drums.
+        """
+        instrument = self.instruments.get((bank, program))
+        if instrument is None:
+            sfont = self.parent.sfont
+            fallback = (DRUM_BANK, 0) if self.is_drums else (0, program)
+            found = bank, program
+            if sfont.find_preset(bank, program) is None and sfont.find_preset(*fallback) is not None:
+                found = fallback
+            instrument = self.instruments[(bank, program)] = self.parent.new_instrument(*found)
+
+        self.bank = bank
+        self.program = program
+        self.instrument = instrument
+
+    def send_event(self, event, frame=None):
+        """
+        Play `event` at `frame` (see `Instrument.send_event`).
+        """
+        event_type = event.type
+        if event_type == EventType.NOTE_ON:
+            # Playing a key again means it's held down, not sustained by the pedal
+            self.held.discard(event.note)
+            self.instrument.note_on(event.note, event.velocity, frame, self, dict(self.mod_inputs))
+        elif event_type == EventType.NOTE_OFF:
+            if self.sustain:
+                self.held.add(event.note)
+            else:
+                self.parent.voices.note_off(self, event.note, frame)
+        elif event_type == EventType.CONTROL_CHANGE:
+            self.control_change(event.controller, event.value, frame)
+        elif event_type == EventType.PITCH_BEND:
+            self.set_mod_input(SFGeneralController.pitchWheel, event.value / 128, frame)
+        elif event_type == EventType.CHANNEL_PRESSURE:
+            self.set_mod_input(SFGeneralController.channelPressure, event.pressure, frame)
+        elif event_type == EventType.PROGRAM_CHANGE:
+            self.select(self.bank, event.program)
+
+    def control_change(self, controller, value, frame=None):
+        if controller == BANK_SELECT:
+            # Takes effect at the next program change. Drums always use the percussion bank.
+            if not self.is_drums:
+                self.bank = value
+        elif controller == RPN_MSB:
+            self.rpn = (value, self.rpn[1] if self.rpn is not None else 127)
+        elif controller == RPN_LSB:
+            self.rpn = (self.rpn[0] if self.rpn is not None else 127, value)
+        elif controller == NRPN_MSB or controller == NRPN_LSB:
+            self.rpn = None     # no non-registered parameters are supported
+        elif controller == DATA_ENTRY or controller == DATA_ENTRY_LSB:
+            if self.rpn == RPN_PITCH_BEND_RANGE:
+                self.bend_range[0 if controller == DATA_ENTRY else 1] = value
+                semitones = self.bend_range[0] + self.bend_range[1] / 100
+                self.set_mod_input(SFGeneralController.pitchWheelSens, semitones_to_wheel_sens(semitones), frame)
+        elif controller == ALL_NOTES_OFF or controller == ALL_SOUND_OFF:
+            self.held.clear()
+            self.parent.voices.all_notes_off(self, frame)
+        elif controller == RESET_CONTROLLERS:
+            self.reset_controllers(frame)
+        elif controller < 128:
+            if controller == SUSTAIN:
+                self.set_sustain(value >= 64, frame)
+            self.set_mod_input(controller, value, frame)
+
+    def set_sustain(self, sustain, frame=None):
+        """
+        Press or release the sustain pedal. Releasing it releases every key that was let go of
+        while it was down.
+        """
+        if self.sustain and not sustain:
+            for key in self.held:
+                self.parent.voices.note_off(self, key, frame)
+            self.held.clear()
+        self.sustain = sustain
+
+    def set_mod_input(self, controller, value, frame=None):
+        if self.mod_inputs[controller] != value:
+            self.mod_inputs[controller] = value
+            self.parent.voices.set_mod_input(self, controller, value, frame)
+
+    def reset_controllers(self, frame=None):
+        self.set_sustain(False, frame)
+        for controller in range(128):
+            if controller not in NOT_RESET:
+                self.set_mod_input(controller, CONTROLLER_DEFAULTS.get(controller, 0), frame)
+        self.set_mod_input(SFGeneralController.channelPressure, 0, frame)
+        self.set_mod_input(SFGeneralController.pitchWheel, BEND_CENTRE / 128, frame)
+        self.rpn = None
@@ -12,6 +12,12 @@ class EnvelopeStage:
 
 class Envelope:
     def __init__(self, delay, attack, hold, decay, sustain, release):
+        self.reset(delay, attack, hold, decay, sustain, release)
+
+    def reset(self, delay, attack, hold, decay, sustain, release):
+        """
+        Start again from the beginning, possibly with different times, so envelopes can be reused.
+        """
         self.phases = [delay, attack, hold, decay, sustain, release, -1]
 
         self.current_phase = EnvelopeStage.DELAY
@@ -5,6 +5,10 @@ from enum import Enum
 class EventType(Enum):
     NOTE_ON = 1
     NOTE_OFF = 2
+    PROGRAM_CHANGE = 3
+    CONTROL_CHANGE = 4
+    PITCH_BEND = 5
+    CHANNEL_PRESSURE = 6
 
 
 
@@ -24,3 +28,31 @@ class EventNoteOff(Event):
     def __init__(self, midi_note):
         super().__init__(EventType.NOTE_OFF)
         self.note = midi_note
+
+
+class EventProgramChange(Event):
+    def __init__(self, program):
+        super().__init__(EventType.PROGRAM_CHANGE)
+        self.program = program
+
+
+class EventControlChange(Event):
+    def __init__(self, controller, value):
+        super().__init__(EventType.CONTROL_CHANGE)
+        self.controller = controller
+        self.value = value
+
+
+class EventPitchBend(Event):
+    def __init__(self, value):
+        """
+        `value` is 14-bit, from 0 to 16383, with 8192 meaning no bend.
+        """
+        super().__init__(EventType.PITCH_BEND)
+        self.value = value
+
+
+class EventChannelPressure(Event):
+    def __init__(self, pressure):
+        super().__init__(EventType.CHANNEL_PRESSURE)
+        self.pressure = pressure
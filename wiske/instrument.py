@@ -8,33 +8,54 @@ from .util.logger import logger
 class Instrument:
     def __init__(self, parent, bank_num, preset_num):
         self.parent = parent
-        for preset in self.sfont.presets:
-            if preset.bank == bank_num and preset.preset_num == preset_num:
-                self.preset = preset
-                break
-
-        self.notes = []
+        self.preset = self.sfont.find_preset(bank_num, preset_num)
+        if self.preset is None:
+            logger.warning("No preset {}:{} in soundfont".format(bank_num, preset_num))
 
     @property
     def sfont(self):
         return self.parent.sfont
 
-    def send_event(self, event):
+    def resolve_note(self, key, vel):
+        """
+        Work out everything about a note at this key and velocity, as a prototype for `VoiceCache`.
+        """
+        zone = self.preset.lookup_zone(key, vel, self.sfont.instruments, self.sfont.samples)
+        if zone is None or not zone.sample:
+            logger.warning("Could not find sample for note at key {}, vel {} in preset {}".format(key, vel, self.preset.name))
+            return None
+
+        if zone.sample.is_rom:
+            logger.warning("Sample {} is in ROM, which isn't supported".format(zone.sample.name))
+            return None
+
+        gens, mods = zone.gens_and_mods()
+        return Note(self.parent.interface, key, vel, zone.sample, gens, mods, zone.linked())
+
+    def note_on(self, key, vel, frame=None, owner=None, mod_inputs=None):
+        """
+        Play a note from this instrument's preset, for `owner` if it's someone else, such as the
+        `Channel` using this instrument (see `VoicePool.note_on`).
+        """
+        if self.preset is None:
+            return
+
+        self.parent.voices.play(self if owner is None else owner, self, key, vel, frame, mod_inputs)
+
+    def prototype(self, key, vel):
+        """
+        The note to spawn for this key and velocity (see `VoiceCache`), or None if nothing
+        should play.
+        """
+        return self.parent.voice_cache.get(self.preset, key, vel, lambda: self.resolve_note(key, vel))
+
+    def send_event(self, event, frame=None):
+        """
+        Play `event` at `frame`, counted in frames mixed since the mixer started (see
+        `Mixer.frame`), or as soon as possible if that's None. Only notes are played; see
+        `Channel` for everything else.
+        """
         if event.type == EventType.NOTE_ON:
-            instrument = self.preset.get_instrument(event.note, event.velocity, self.sfont.instruments)
-            sample = instrument.get_sample(event.note, event.velocity, self.sfont.samples)
-            if not sample:
-                logger.warning("Could not find sample for note at key {}, vel {} in instrument {}".format(event.note, event.velocity, instrument.name))
-                return
-
-            gens, mods = self.preset.get_gens_and_mods(event.note, event.velocity, instrument)
-            new_note = Note(self.parent.interface, event.note, event.velocity, sample, gens, mods)
-            self.notes.append(new_note)
-            new_note.play()
+            self.note_on(event.note, event.velocity, frame)
         elif event.type == EventType.NOTE_OFF:
-            for i in range(len(self.notes) - 1, -1, -1):
-                note = self.notes[i]
-                if note.key != event.note:
-                    continue
-                note.stop()
-                del self.notes[i]
+            self.parent.voices.note_off(self, event.note, frame)
@@ -1,3 +1,6 @@
 from .interface import AudioInterface
+from .mixer import Mixer
 from .config import AudioConfig
 from .buffer import CustomBuffer
+from .sinks import AudioSink, AlsaSink, NullSink, WavFileSink, MemorySink, PipeSink
+from .stats import RenderStats
@@ -1,11 +1,13 @@
+def run_alsa(cfg, ring):
+    # Imported here so that wiske can still be used without pyalsaaudio, through other sinks
+    import alsaaudio as aa
 
-import alsaaudio as aa
-from ..util.logger import logger
-
-def run_alsa(cfg, data_queue):
     pcm = aa.PCM(rate=cfg.sample_rate, channels=cfg.channels, periodsize=cfg.period_size)
 
     write = pcm.write
-    get = data_queue.get
+    peek = ring.peek
+    advance = ring.advance
     while True:
-        write(get())
+        # Only release the slot once ALSA has taken its own copy of it
+        write(peek())
+        advance()
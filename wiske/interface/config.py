@@ -1,11 +1,33 @@
+from .sinks import AlsaSink
+from ..interpolation import Interpolation
+
 
 class AudioConfig:
-    def __init__(self, sample_rate=44100, channels=2, period_size=32):
+    def __init__(self, sample_rate=44100, channels=2, period_size=32, sink=None, interpolation=Interpolation.LINEAR,
+                 sample_mipmaps=False):
         self.sample_rate = sample_rate  # Hz
         self.channels = channels
         self.period_size = period_size  # frames
 
-        self.period_length = self.period_size / (self.channels * self.sample_rate)
+        # Where the mixed audio goes, see sinks.py
+        self.sink = sink if sink is not None else AlsaSink()
+
+        # How samples are interpolated when repitched, see interpolation.py. Better quality
+        # costs more time per voice.
+        self.interpolation = interpolation
+
+        # Whether notes pitched up by an octave or more play from decimated copies of their
+        # samples, see mipmap.py. Sounds better for high notes, but takes more memory.
+        self.sample_mipmaps = sample_mipmaps
+
+    @property
+    def period_length(self):
+        """
+        Length of a period in seconds, which is also how long the mixer has to render one.
+        """
+        return self.period_size / self.sample_rate
 
     def __str__(self):
-        return "AudioConfig: fs {}Hz, {} chan, period size {} frames".format(self.sample_rate, self.channels, self.period_size)
+        return "AudioConfig: fs {}Hz, {} chan, period size {} frames, sink {}".format(
+            self.sample_rate, self.channels, self.period_size, type(self.sink).__name__
+        )
@@ -7,3 +7,9 @@ class MessageType(Enum):
     DELETE_BUFFER = 3
     REQUEST_REPONSES = 4
     END_LOOP = 5
+    START_VOICE = 6
+    RELEASE_VOICE = 7
+    WORKER_COMMAND = 8
+    SET_WORKERS = 9
+    SCHEDULE = 10
+    MOD_INPUT = 11
@@ -0,0 +1,380 @@
+from collections import deque
+from heapq import heappush, heappop
+from itertools import count
+from time import perf_counter
+
+import numpy as np
+
+from ..util.logger import logger
+from .buffer import AudioBuffer
+from .message import MessageType
+from .stats import RenderStats
+
+
+class Mixer:
+    """
+    Keeps track of every buffer being played, and mixes them down a period at a time.
+    This knows nothing about where the mixed audio ends up: `AudioInterface` drives it in
+    real time, and `OfflineRenderer` drives it as fast as it can.
+
+    Anything that changes what is being played is sent as a message to the thread doing the
+    mixing, which handles them all at the start of the next period. Only that thread ever
+    touches the buffers, so the mix never has to wait on a lock held by whoever is starting
+    and stopping notes.
+
+    Messages can also be scheduled for a particular frame with `send_at`. The period that frame
+    falls in is mixed in two parts, with the message handled in between, so events land on the
+    exact sample they are meant to whenever the period was mixed.
+    """
+    def __init__(self, config, use_buffering=False):
+        # Format by default is signed 16-bit LE
+        self.cfg = config
+        self.frame_size = 2     # bytes
+
+        self.use_buffering = use_buffering
+        self.target_latency = 0.01      # only valid with use_buffering = True
+        self.init_buffer_samples = int(self.cfg.sample_rate * self.target_latency)
+        self.volume = 1 # 0.1       # should not be changed during playback unless appropriate changes are made
+        self.period_size_words = self.cfg.period_size * self.cfg.channels
+
+        # Mixing bus, and the int16 output it gets written to. Both are reused every period.
+        self.mix_bus = np.zeros(self.period_size_words, dtype=np.float32)
+        self.out_bytes = bytearray(self.period_size_words * self.frame_size)
+        self.out_words = np.frombuffer(self.out_bytes, dtype="<i2")
+
+        # (MessageType, args) tuples. Appending and popping from either end of a deque is
+        # atomic, so this needs no lock with a single producer and a single consumer.
+        self.messages = deque()
+
+        # (frame, sequence number, MessageType, args) heap of scheduled messages, and the number
+        # of frames mixed so far, which is the frame the next period starts at
+        self.scheduled = []
+        self.sequence = count()
+        self.frame = 0
+
+        self.buffers = {}
+        self.raw_buffers = {}
+        self.custom_collect_funcs = {}
+        self.last = 0
+
+        # The buffers that aren't finished, which are the only ones mixed. Buffers that finish
+        # during a period are collected in `finished` and dealt with all at once afterwards.
+        self.playing = {}
+        self.finished = []
+
+        self.stats = None
+        self.workers = None     # see parallel.py
+        self.retired_workers = []   # stopped, waiting for `close_retired_workers`
+
+    def __do_extend(self, start_point, buf_id, buffer, buf_size, channel_ratio):
+        chunk_size = self.init_buffer_samples * 2
+        while start_point < buf_size:
+            chunk = self.to_words(buffer[start_point:start_point + chunk_size], channel_ratio)
+            self.send(MessageType.EXTEND_BUFFER, buf_id, chunk)
+            start_point += chunk_size
+
+    def to_words(self, frames, channel_ratio):
+        words = np.asarray(frames, dtype=np.float32)
+        if channel_ratio == 1:
+            return words
+        return np.repeat(words, channel_ratio)
+
+    def play(self, buffer, channels = 2, loop = None, immortal = False):
+        """
+        Play a buffer, which should be given as a list of frames. bytes-like objects
+        are also accepted. channels specifies the number of channels of the buffer to
+        be played, and must be a power of two and >= 1, and must be <= the audio config
+        number of channels for this interface. If `immortal` is specified, the buffer
+        will not be deleted upon finishing, allowing you to extend it or restart it.
+        This comes with the responsibility of making sure not all the memory is used up
+        by immortal buffers.
+        """
+        # buffer should be given as a list of frames where possible
+        if type(buffer) == bytes:
+            buffer = np.frombuffer(buffer, dtype="<i2")
+
+        buf_size = len(buffer)
+        start_point = buf_size if not self.use_buffering else min(self.init_buffer_samples, buf_size)
+        channel_ratio = self.cfg.channels // channels
+
+        # We create an initial buffer up to a start point determined by the target latency
+        new_data = self.to_words(buffer[:start_point], channel_ratio)
+
+        self.last += 1
+        loop = None if loop is None else tuple([x * channel_ratio for x in loop])
+        buf = AudioBuffer(self.last, len(new_data), immortal, loop)
+
+        self.send(MessageType.NEW_BUFFER, buf, new_data)
+
+        # Now the buffer has been added to the playback processor, we can start extending it
+        # with chunks while the first bit of it is playing back. Hopefully we can outpace it.
+        if self.use_buffering:
+            self.__do_extend(start_point, self.last, buffer, buf_size, channel_ratio)
+
+        return self.last
+
+    def extend(self, buffer_id, buffer, channels = 2):
+        # buffer should be given as a list of frames where possible
+        if type(buffer) == bytes:
+            buffer = np.frombuffer(buffer, dtype="<i2")
+
+        buf_size = len(buffer)
+        channel_ratio = self.cfg.channels // channels
+
+        self.__do_extend(0, buffer_id, buffer, buf_size, channel_ratio)
+
+        return buffer_id
+
+    def end_loop(self, buffer_id):
+        self.send(MessageType.END_LOOP, buffer_id)
+
+    def delete(self, buffer_id):
+        self.send(MessageType.DELETE_BUFFER, buffer_id)
+
+    def add_custom_buffer(self, custom_buf, collect_func):
+        self.last += 1
+        custom_buf.id = self.last
+        self.send(MessageType.NEW_BUFFER, custom_buf, collect_func)
+        return self.last
+
+    def send(self, message_type, *args):
+        """
+        Queue up a message for the mixing thread, which handles it before mixing the next period.
+        """
+        self.messages.append((message_type, args))
+
+    def send_at(self, frame, message_type, *args):
+        """
+        Like `send`, but the message is handled at `frame` (see `frame`) rather than at the start
+        of the next period. Frames that have already been mixed mean as soon as possible, and so
+        does None.
+        """
+        if frame is None:
+            self.messages.append((message_type, args))
+        else:
+            self.messages.append((MessageType.SCHEDULE, (frame, message_type, args)))
+
+    def handle_messages(self):
+        messages = self.messages
+        while messages:
+            message_type, args = messages.popleft()
+            if message_type == MessageType.SCHEDULE:
+                frame, message_type, args = args
+                heappush(self.scheduled, (frame, next(self.sequence), message_type, args))
+            else:
+                self.handle_message(message_type, args)
+
+    def handle_message(self, message_type, args):
+        buffers = self.buffers
+        if message_type == MessageType.START_VOICE:
+            voice, prototype, mod_inputs = args
+            voice.start(prototype, mod_inputs)
+            self.playing[voice.buffer.id] = voice.buffer
+        elif message_type == MessageType.RELEASE_VOICE:
+            args[0].release()
+        elif message_type == MessageType.MOD_INPUT:
+            voice, controller, value = args
+            voice.set_mod_input(controller, value)
+        elif message_type == MessageType.NEW_BUFFER:
+            buffer, payload = args
+            buffers[buffer.id] = buffer
+            if buffer.is_custom:
+                self.custom_collect_funcs[buffer.id] = payload
+            else:
+                self.raw_buffers[buffer.id] = payload
+            if not buffer.finished:
+                self.playing[buffer.id] = buffer
+            elif not buffer.immortal:
+                self.finished.append(buffer.id)     # nothing to play, so just reclaim it
+        elif message_type == MessageType.EXTEND_BUFFER:
+            buf_id, chunk = args
+            self.raw_buffers[buf_id] = np.concatenate((self.raw_buffers[buf_id], chunk))
+            buffers[buf_id].size += len(chunk)
+            self.playing[buf_id] = buffers[buf_id]   # may have finished, if it was immortal
+        elif message_type == MessageType.END_LOOP:
+            if args[0] in buffers:
+                buffers[args[0]].end_loop()
+        elif message_type == MessageType.DELETE_BUFFER:
+            buf_id = args[0]
+            if buf_id in buffers:
+                self.remove(buf_id)
+        elif message_type == MessageType.WORKER_COMMAND:
+            worker, command = args
+            self.workers.send(worker, command)
+        elif message_type == MessageType.SET_WORKERS:
+            if self.workers is not None:
+                # Waiting for them to exit is left to `close_retired_workers`
+                self.workers.stop()
+                self.retired_workers.append(self.workers)
+            self.workers = args[0]
+        else:
+            logger.warning("Mixer: unhandled message {}".format(message_type))
+
+    def close_retired_workers(self):
+        """
+        Wait for worker pools the mixer has stopped using to exit, and free them. Not for the
+        mixing thread, as this can take a while.
+        """
+        retired = self.retired_workers
+        while retired:
+            retired.pop().close()
+
+    def remove(self, buf_id):
+        del self.buffers[buf_id]
+        self.playing.pop(buf_id, None)
+        if buf_id in self.raw_buffers:
+            del self.raw_buffers[buf_id]
+        else:
+            del self.custom_collect_funcs[buf_id]
+
+    def reclaim(self):
+        """
+        Stop mixing every buffer that finished during the last period, and delete the ones that
+        aren't immortal to free up memory.
+        """
+        playing = self.playing
+        buffers = self.buffers
+        for buf_id in self.finished:
+            if buffers[buf_id].immortal:
+                del playing[buf_id]
+            else:
+                self.remove(buf_id)
+        self.finished.clear()
+
+    def enable_stats(self, sample_every=1):
+        """
+        Start measuring every `sample_every`th period, see `RenderStats`. Returns the stats.
+        """
+        self.stats = RenderStats(self.cfg.period_length, sample_every)
+        return self.stats
+
+    def disable_stats(self):
+        self.stats = None
+
+    @property
+    def live_count(self):
+        """
+        Number of buffers (including voices) still playing.
+        """
+        return len(self.playing)
+
+    @property
+    def is_silent(self):
+        """
+        True if nothing is left that could still make a sound.
+        """
+        if self.workers is not None and self.workers.busy:
+            return False
+        return not self.messages and not self.scheduled and not self.playing
+
+    def mix_period(self):
+        """
+        Mix a single period from every buffer, returning it as signed 16-bit LE bytes.
+        The returned bytearray is reused for the next period, so copy it if it needs to
+        outlive that.
+        """
+        VAL_LIMIT = (1 << 15) - 1   # globals are slow
+        bus = self.mix_bus
+        stats = self.stats
+        measure = stats is not None and stats.due()
+        if measure:
+            start = perf_counter()
+
+        self.handle_messages()
+        workers = self.workers
+
+        if measure:
+            voices = len(self.playing) + (workers.live_count if workers is not None else 0)
+            mix_start = perf_counter()
+
+        # Workers render their voices while this thread mixes its own buffers
+        if workers is not None:
+            workers.start_period(self.frame)
+        self.mix_buffers()
+        if workers is not None:
+            workers.finish_period(bus)
+
+        if measure:
+            mix_time = perf_counter() - mix_start
+
+        # Volume, clipping and conversion to int16 all in place. Conversion truncates
+        # towards zero, the same as int() would.
+        if self.volume != 1:
+            bus *= self.volume
+        np.clip(bus, -VAL_LIMIT, VAL_LIMIT, out=bus)
+        self.out_words[:] = bus
+
+        if measure:
+            stats.record_period(perf_counter() - start, mix_time, voices)
+        return self.out_bytes
+
+    def mix_buffers(self):
+        """
+        Mix a period from every buffer into the mix bus, without clipping or converting it.
+        Scheduled messages due during the period are handled at their frame, splitting the
+        period around them.
+        """
+        bus = self.mix_bus
+        bus.fill(0)
+
+        scheduled = self.scheduled
+        period_start = self.frame
+        period_end = period_start + self.cfg.period_size
+        mixed = 0   # words
+        while scheduled and scheduled[0][0] < period_end:
+            frame, _, message_type, args = heappop(scheduled)
+            split = max(frame - period_start, 0) * self.cfg.channels
+            if split > mixed:
+                self.mix_span(bus[mixed:split])
+                mixed = split
+            self.handle_message(message_type, args)
+
+        if mixed < self.period_size_words:
+            self.mix_span(bus[mixed:] if mixed else bus)
+        self.frame = period_end
+
+    def mix_span(self, bus):
+        """
+        Mix the next `len(bus)` words of every buffer into `bus`.
+        """
+        # Local vars for optimization
+        raw_bufs = self.raw_buffers
+        collect_funcs = self.custom_collect_funcs
+        req_size = len(bus)
+        playing = self.playing
+        finished = self.finished
+
+        for buf_id in playing:
+            buffer = playing[buf_id]
+            meta = buffer.get_request(req_size)
+
+            if not meta[0]:   # is not custom
+                _, buf_id, offset, loop_start, loop_end = meta
+                data = raw_bufs[buf_id]
+                uses_loop = loop_start != -1 and loop_end != -1
+                if not uses_loop:
+                    chunk = data[offset:offset + req_size]
+                    bus[:len(chunk)] += chunk
+                    buffer.offset = offset + len(chunk)
+                else:
+                    i = 0
+                    while i < req_size:
+                        chunk_size = min(req_size - i, loop_end - offset)
+                        if chunk_size <= 0:
+                            break
+                        bus[i:i + chunk_size] += data[offset:offset + chunk_size]
+                        i += chunk_size
+                        offset += chunk_size
+                        if offset >= loop_end:
+                            offset = loop_start
+                    buffer.offset = offset
+            else:
+                _, buf_id, *args = meta
+                block = collect_funcs[buf_id](req_size, *args)
+                bus[:len(block)] += block
+
+            if buffer.finished:
+                finished.append(buf_id)
+
+        if finished:
+            self.reclaim()
@@ -0,0 +1,88 @@
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# Counters at the start of the shared memory: periods written, periods read, and how many
+# times the reader found nothing to read
+HEADER_SIZE = 24
+WRITTEN = 0
+READ = 1
+STARVED = 2
+
+
+class RingBuffer:
+    """
+    Lock-free single producer, single consumer ring buffer of fixed size slots in shared memory,
+    for passing periods of audio between processes without pickling them.
+
+    Each side only ever stores to its own counter, and the producer only publishes a slot after
+    it has been filled in, so no lock is needed. Only one process may write, and one read.
+    """
+    def __init__(self, slots, slot_size, wait=0.0005, name=None):
+        self.slots = slots
+        self.slot_size = slot_size
+        self.wait = wait    # seconds to sleep while full or empty
+        self.owner = name is None
+
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=HEADER_SIZE + slots * slot_size)
+        self.counters = np.ndarray((3,), dtype=np.uint64, buffer=self.shm.buf)
+        self.data = self.shm.buf[HEADER_SIZE:]
+        if self.owner:
+            self.counters[:] = 0
+
+    def __reduce__(self):
+        # When sent to another process, attach to the same shared memory rather than copying
+        return (RingBuffer, (self.slots, self.slot_size, self.wait, self.shm.name))
+
+    def fill_level(self):
+        """
+        Number of slots written but not yet read.
+        """
+        return int(self.counters[WRITTEN] - self.counters[READ])
+
+    def starved(self):
+        """
+        Number of times the consumer has had to wait for the producer.
+        """
+        return int(self.counters[STARVED])
+
+    def write(self, data):
+        """
+        Copy a slot's worth of data in, blocking while the buffer is full.
+        """
+        counters = self.counters
+        written = int(counters[WRITTEN])
+        while written - int(counters[READ]) >= self.slots:
+            time.sleep(self.wait)
+
+        start = (written % self.slots) * self.slot_size
+        self.data[start:start + self.slot_size] = data
+        counters[WRITTEN] = written + 1
+
+    def peek(self):
+        """
+        Returns a view of the oldest unread slot, blocking while the buffer is empty. The slot
+        isn't released back to the producer until `advance` is called.
+        """
+        counters = self.counters
+        read = int(counters[READ])
+        if int(counters[WRITTEN]) == read:
+            counters[STARVED] = int(counters[STARVED]) + 1
+            while int(counters[WRITTEN]) == read:
+                time.sleep(self.wait)
+
+        start = (read % self.slots) * self.slot_size
+        return self.data[start:start + self.slot_size]
+
+    def advance(self):
+        self.counters[READ] = int(self.counters[READ]) + 1
+
+    def close(self):
+        # Views into the shared memory have to go before it can be closed
+        del self.counters
+        self.data.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
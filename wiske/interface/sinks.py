@@ -0,0 +1,158 @@
+import sys
+import wave
+from multiprocessing import Process
+
+from ..util.logger import logger
+from .alsa import run_alsa
+from .ringbuffer import RingBuffer
+
+
+class AudioSink:
+    """
+    Where mixed audio ends up. `write` is given a period of signed 16-bit LE audio at a time,
+    in a bytearray that gets reused afterwards, and may block if the sink needs the mixer to
+    slow down. Sinks that aren't `realtime` take audio as fast as it can be mixed.
+    """
+    realtime = False
+
+    def open(self, cfg, max_latency):
+        self.cfg = cfg
+
+    def write(self, data):
+        raise NotImplementedError()
+
+    def fill_level(self):
+        """
+        How many periods have been written but not played yet.
+        """
+        return 0
+
+    def underruns(self):
+        """
+        How many times the sink has run out of audio to play.
+        """
+        return 0
+
+    def close(self):
+        pass
+
+
+class AlsaSink(AudioSink):
+    """
+    Plays through ALSA, from a separate process. Needs pyalsaaudio.
+    """
+    realtime = True
+
+    def open(self, cfg, max_latency):
+        super().open(cfg, max_latency)
+
+        # Ring size = max latency / length of period
+        slots = max(2, int(max_latency / cfg.period_length))
+        self.ring = RingBuffer(slots, cfg.period_size * cfg.channels * 2, wait=cfg.period_length / 4)
+        self.process = Process(target=run_alsa, args=(cfg, self.ring))
+        self.process.start()
+
+        logger.info("ALSA sink: ring size is {} (max latency {:.5f}s)".format(slots, max_latency))
+
+    def write(self, data):
+        # Copied straight into shared memory, so no need to copy it beforehand
+        self.ring.write(data)
+
+    def fill_level(self):
+        return self.ring.fill_level()
+
+    def underruns(self):
+        return self.ring.starved()
+
+    def close(self):
+        self.process.terminate()
+        self.process.join()
+        self.ring.close()
+
+
+class NullSink(AudioSink):
+    """
+    Throws everything away. Useful for measuring how fast the mixer itself is.
+    """
+    def open(self, cfg, max_latency):
+        super().open(cfg, max_latency)
+        self.periods = 0
+
+    def write(self, data):
+        self.periods += 1
+
+
+class WavFileSink(AudioSink):
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def open(self, cfg, max_latency):
+        super().open(cfg, max_latency)
+        self.file = wave.open(self.path, "wb")
+        self.file.setnchannels(cfg.channels)
+        self.file.setsampwidth(2)
+        self.file.setframerate(cfg.sample_rate)
+
+    def write(self, data):
+        self.file.writeframesraw(data)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class MemorySink(AudioSink):
+    """
+    Keeps the last `seconds` of audio in a ring buffer, which can be fetched with `read`.
+    """
+    def __init__(self, seconds=10):
+        self.seconds = seconds
+
+    def open(self, cfg, max_latency):
+        super().open(cfg, max_latency)
+        self.capacity = int(self.seconds * cfg.sample_rate) * cfg.channels * 2
+        self.data = bytearray(self.capacity)
+        self.written = 0
+
+    def write(self, data):
+        size = len(data)
+        if size > self.capacity:
+            data = data[size - self.capacity:]
+            self.written += size - self.capacity
+            size = self.capacity
+
+        start = self.written % self.capacity
+        first = min(size, self.capacity - start)
+        self.data[start:start + first] = data[:first]
+        self.data[:size - first] = data[first:]
+        self.written += size
+
+    def read(self):
+        """
+        Returns everything still held, oldest first, as bytes.
+        """
+        if self.written <= self.capacity:
+            return bytes(self.data[:self.written])
+        start = self.written % self.capacity
+        return bytes(self.data[start:] + self.data[:start])
+
+
+class PipeSink(AudioSink):
+    """
+    Writes raw audio to a binary stream, stdout by default, e.g. to pipe into `aplay`.
+    """
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def open(self, cfg, max_latency):
+        super().open(cfg, max_latency)
+        if self.stream is None:
+            self.stream = sys.stdout.buffer
+
+    def write(self, data):
+        self.stream.write(data)
+
+    def close(self):
+        self.stream.flush()
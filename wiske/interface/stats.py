@@ -0,0 +1,114 @@
+import numpy as np
+
+
+# Render times are put into bins a tenth of a period long, with everything over two periods
+# going into the last one
+BINS_PER_PERIOD = 10
+HISTOGRAM_BINS = 2 * BINS_PER_PERIOD + 1
+
+
+class RenderStats:
+    """
+    Measures how long periods take to mix compared to how long they last, along with how many
+    voices were playing and how far ahead of the sink the mixer was. Turned on with
+    `Mixer.enable_stats`.
+
+    Only one in every `sample_every` periods is measured, to keep the overhead down. Counts are
+    of measured periods only, so with sampling they are a fraction of the real numbers.
+
+    Voices aren't timed one by one, so `mean_time_per_voice` is only an estimate: the mixing
+    time of periods with voices playing, divided by how many were. It includes the mixer's
+    own overhead, and with workers, voices rendered in parallel with it.
+    """
+    def __init__(self, deadline, sample_every=1):
+        self.deadline = deadline    # seconds, the length of a period
+        self.sample_every = sample_every
+        self.reset()
+
+    def reset(self):
+        self.periods = 0            # every period, measured or not
+        self.measuring = False      # whether the current period is being measured
+        self.sampled = 0
+        self.histogram = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+        self.deadline_misses = 0
+        self.total_time = 0
+        self.max_time = 0
+
+        self.total_voices = 0
+        self.max_voices = 0
+        self.voice_time = 0         # time spent mixing in periods with voices playing
+        self.voice_count = 0        # total voices mixed in those periods
+
+        self.fill_samples = 0
+        self.total_fill = 0
+        self.min_fill = None
+        self.underruns = 0
+
+    def due(self):
+        """
+        Counts a period, returning True if it should be measured.
+        """
+        self.periods += 1
+        self.measuring = self.periods % self.sample_every == 0
+        return self.measuring
+
+    def record_period(self, render_time, mix_time, voices):
+        """
+        `render_time` is the time taken for the whole period, and `mix_time` the part of it
+        spent mixing `voices` buffers.
+        """
+        self.sampled += 1
+        self.histogram[min(int(render_time / self.deadline * BINS_PER_PERIOD), HISTOGRAM_BINS - 1)] += 1
+        if render_time > self.deadline:
+            self.deadline_misses += 1
+        self.total_time += render_time
+        self.max_time = max(self.max_time, render_time)
+
+        self.total_voices += voices
+        self.max_voices = max(self.max_voices, voices)
+        if voices:
+            self.voice_time += mix_time
+            self.voice_count += voices
+
+    def record_fill(self, fill_level, underruns):
+        """
+        `fill_level` is how many periods the sink has queued up, and `underruns` how many
+        times in total it has run dry.
+        """
+        self.fill_samples += 1
+        self.total_fill += fill_level
+        self.min_fill = fill_level if self.min_fill is None else min(self.min_fill, fill_level)
+        self.underruns = underruns
+
+    def summary(self):
+        """
+        Everything measured so far as a dict, with times in seconds.
+        """
+        sampled = max(self.sampled, 1)
+        return {
+            "periods": self.periods,
+            "sampled": self.sampled,
+            "deadline": self.deadline,
+            "mean_render_time": self.total_time / sampled,
+            "max_render_time": self.max_time,
+            "deadline_misses": self.deadline_misses,
+            "histogram": {
+                "bin_width": self.deadline / BINS_PER_PERIOD,
+                "counts": self.histogram.tolist(),
+            },
+            "mean_voices": self.total_voices / sampled,
+            "max_voices": self.max_voices,
+            "mean_time_per_voice": self.voice_time / self.voice_count if self.voice_count else 0,
+            "mean_fill_level": self.total_fill / self.fill_samples if self.fill_samples else None,
+            "min_fill_level": self.min_fill,
+            "underruns": self.underruns,
+        }
+
+    def __str__(self):
+        s = self.summary()
+        return "RenderStats: {} periods ({} sampled), mean {:.1f}us / max {:.1f}us of {:.1f}us, {} deadline misses, " \
+            "voices mean {:.1f} / max {}, ~{:.2f}us per voice, {} underruns".format(
+                s["periods"], s["sampled"], s["mean_render_time"] * 1e6, s["max_render_time"] * 1e6,
+                s["deadline"] * 1e6, s["deadline_misses"], s["mean_voices"], s["max_voices"],
+                s["mean_time_per_voice"] * 1e6, s["underruns"]
+            )
@@ -0,0 +1,86 @@
+"""
+Interpolation between sample points, for playing samples back at a different pitch.
+
+Higher quality modes weigh up more neighbouring points. Their weights for any fractional
+position come from a table worked out once here, so choosing a better mode costs more memory
+reads per output sample, but no extra maths per sample.
+"""
+
+from math import pi
+
+import numpy as np
+
+
+# Not an enum for performance reasons
+class Interpolation:
+    LINEAR = 0      # 2 points
+    HERMITE = 1     # 4 point, 3rd order Hermite (Catmull-Rom)
+    SINC = 2        # 8 point windowed sinc
+
+
+# Number of fractional positions between two points that there are weights for
+TABLE_RESOLUTION = 1024
+
+SINC_POINTS = 8
+
+
+def hermite_table(fracs):
+    # Weights for points i - 1, i, i + 1 and i + 2
+    f2 = fracs * fracs
+    f3 = f2 * fracs
+    return np.stack((
+        -0.5 * f3 + f2 - 0.5 * fracs,
+        1.5 * f3 - 2.5 * f2 + 1,
+        -1.5 * f3 + 2 * f2 + 0.5 * fracs,
+        0.5 * f3 - 0.5 * f2,
+    ), axis=1)
+
+
+def sinc_table(fracs):
+    # Weights for points i - 3 to i + 4, with a Blackman window over all eight
+    half = SINC_POINTS // 2
+    x = np.arange(1 - half, half + 1)[np.newaxis, :] - fracs[:, np.newaxis]
+    window = 0.42 + 0.5 * np.cos(pi * x / half) + 0.08 * np.cos(2 * pi * x / half)
+    table = np.sinc(x) * window
+
+    # Normalise, so that a constant signal stays at the same level
+    return table / table.sum(axis=1)[:, np.newaxis]
+
+
+def build_tables():
+    fracs = np.arange(TABLE_RESOLUTION + 1) / TABLE_RESOLUTION
+    return {
+        Interpolation.HERMITE: (hermite_table(fracs), -1),
+        Interpolation.SINC: (sinc_table(fracs), 1 - SINC_POINTS // 2),
+    }
+
+# Mode: (weights for each fractional position, offset of the first point from i)
+TABLES = build_tables()
+
+# The most points past i that any mode reads
+MAX_REACH = SINC_POINTS // 2
+
+
+def interpolate(data, positions, mode=Interpolation.LINEAR):
+    """
+    Values of `data` at each of the fractional `positions`. Points outside `data` are taken
+    to be the nearest one inside it. If `data` has a second axis (channels of stereo data),
+    every channel is read at the same positions, and the result has that axis too.
+    """
+    first = positions.astype(np.intp)
+    frac = positions - first
+    if mode == Interpolation.LINEAR:
+        second = np.minimum(first + 1, len(data) - 1)
+        s1 = data.take(first, axis=0).astype(np.float64)
+        s2 = data.take(second, axis=0).astype(np.float64)
+        if data.ndim > 1:
+            frac = frac[:, np.newaxis]
+        return s1 + (s2 - s1) * frac
+
+    table, start = TABLES[mode]
+    weights = table[(frac * TABLE_RESOLUTION + 0.5).astype(np.intp)]
+    points = first[:, np.newaxis] + np.arange(start, start + table.shape[1])
+    np.clip(points, 0, len(data) - 1, out=points)
+    if data.ndim > 1:
+        return np.einsum("ijk,ij->ik", data.take(points, axis=0), weights)
+    return np.einsum("ij,ij->i", data.take(points), weights)
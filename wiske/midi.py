@@ -0,0 +1,183 @@
+import heapq
+import mmap
+import os
+import struct
+
+from .event import EventNoteOn, EventNoteOff, EventProgramChange, EventControlChange, EventPitchBend, EventChannelPressure
+
+
+DEFAULT_TEMPO = 500000      # microseconds per quarter note, i.e. 120bpm
+
+# Number of data bytes following each kind of channel message, by its high nibble
+CHANNEL_MESSAGE_LENGTHS = {
+    0x8: 2,     # note off
+    0x9: 2,     # note on
+    0xA: 2,     # polyphonic key pressure
+    0xB: 2,     # control change
+    0xC: 1,     # program change
+    0xD: 1,     # channel pressure
+    0xE: 2,     # pitch bend
+}
+
+NOTE_OFF = 0x8
+NOTE_ON = 0x9
+CONTROL_CHANGE = 0xB
+PROGRAM_CHANGE = 0xC
+CHANNEL_PRESSURE = 0xD
+PITCH_BEND = 0xE
+
+META_EVENT = 0xFF
+META_END_OF_TRACK = 0x2F
+META_TEMPO = 0x51
+
+
+class MidiReadException(Exception):
+    def __init__(self, message):
+        super().__init__()
+        self.message = message
+
+
+def read_var_len(data, pos):
+    value = 0
+    while True:
+        try:
+            byte = data[pos]
+        except IndexError:
+            raise MidiReadException("Variable length quantity runs off the end of the track")
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos
+
+
+def read_track(data):
+    """
+    Yields (tick, status, data bytes) for the channel messages in a track, and
+    (tick, META_TEMPO, microseconds per quarter note) for any tempo changes.
+    """
+    pos = 0
+    tick = 0
+    running_status = None
+    size = len(data)
+    while pos < size:
+        delta, pos = read_var_len(data, pos)
+        tick += delta
+
+        if pos >= size:
+            raise MidiReadException("Track ends part way through an event")
+        status = data[pos]
+        if status & 0x80:
+            pos += 1
+        elif running_status is None:
+            raise MidiReadException("Running status used before any status byte")
+        else:
+            status = running_status
+
+        if status == META_EVENT:
+            if pos >= size:
+                raise MidiReadException("Track ends part way through an event")
+            meta_type = data[pos]
+            length, pos = read_var_len(data, pos + 1)
+            if meta_type == META_TEMPO:
+                yield tick, META_TEMPO, int.from_bytes(data[pos:pos + 3], "big")
+            pos += length
+            if meta_type == META_END_OF_TRACK:
+                return
+        elif status in (0xF0, 0xF7):
+            # Sysex, skip it
+            length, pos = read_var_len(data, pos)
+            pos += length
+        else:
+            length = CHANNEL_MESSAGE_LENGTHS.get(status >> 4)
+            if length is None:
+                # System common and realtime messages don't belong in a file
+                raise MidiReadException("Unexpected status byte 0x{:02X}".format(status))
+            if pos + length > size:
+                raise MidiReadException("Track ends part way through an event")
+            running_status = status
+            yield tick, status, bytes(data[pos:pos + length])
+            pos += length
+
+
+def read_chunks(data):
+    pos = 0
+    while pos + 8 <= len(data):
+        ident = bytes(data[pos:pos + 4])
+        length = struct.unpack(">I", data[pos + 4:pos + 8])[0]
+        yield ident, data[pos + 8:pos + 8 + length]
+        pos += 8 + length
+
+
+def iter_midi_file(path):
+    """
+    Yields (time in seconds, channel, event) tuples from a standard MIDI file in time order.
+    Every channel message is kept bar polyphonic key pressure, which nothing uses.
+
+    The file is memory mapped and its tracks are parsed as they are merged, so only one
+    event from each track is held in memory at a time, however long the file is.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise MidiReadException("File is empty")
+        data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    chunks = read_chunks(data)
+    try:
+        ident, header = next(chunks)
+    except StopIteration:
+        raise MidiReadException("File is empty")
+    if ident != b"MThd":
+        raise MidiReadException("Missing MThd header")
+
+    _, _, division = struct.unpack(">HHh", header[:6])
+
+    # Merge the tracks by tick. Ties go to the earlier track, so simultaneous events
+    # keep their order within a track, and tempo changes in the first track come first.
+    tracks = [read_track(track) for ident, track in chunks if ident == b"MTrk"]
+    timeline = heapq.merge(*tracks, key=lambda x: x[0])
+
+    if division < 0:
+        # SMPTE time: -frames per second in the high byte, ticks per frame in the low byte
+        secs_per_tick = 1 / (-(division >> 8) * (division & 0xFF))
+        tempo_scaled = False
+    else:
+        secs_per_tick = DEFAULT_TEMPO / 1000000 / division
+        tempo_scaled = True
+
+    # Times are worked out from the last tempo change rather than added up event by
+    # event, so rounding errors don't build up over long files
+    tempo_tick = 0
+    tempo_secs = 0
+    for tick, status, payload in timeline:
+        secs = tempo_secs + (tick - tempo_tick) * secs_per_tick
+
+        if status == META_TEMPO:
+            if tempo_scaled:
+                tempo_tick = tick
+                tempo_secs = secs
+                secs_per_tick = payload / 1000000 / division
+            continue
+
+        kind = status >> 4
+        channel = status & 0x0F
+        if kind == NOTE_ON and payload[1] > 0:
+            yield secs, channel, EventNoteOn(payload[0], payload[1])
+        elif kind == NOTE_OFF or kind == NOTE_ON:
+            yield secs, channel, EventNoteOff(payload[0])
+        elif kind == CONTROL_CHANGE:
+            yield secs, channel, EventControlChange(payload[0], payload[1])
+        elif kind == PROGRAM_CHANGE:
+            yield secs, channel, EventProgramChange(payload[0])
+        elif kind == PITCH_BEND:
+            # Least significant 7 bits first
+            yield secs, channel, EventPitchBend(payload[0] | (payload[1] << 7))
+        elif kind == CHANNEL_PRESSURE:
+            yield secs, channel, EventChannelPressure(payload[0])
+
+
+def read_midi_file(path):
+    """
+    Read a standard MIDI file, returning a list of (time in seconds, channel, event) tuples
+    in time order. See `iter_midi_file` to avoid holding them all at once.
+    """
+    return list(iter_midi_file(path))
@@ -0,0 +1,48 @@
+import time
+
+from .midi import iter_midi_file
+from .channel import CHANNELS
+
+
+class MidiPlayer:
+    """
+    Plays a standard MIDI file on `parent`, which is a `Synthesizer` or an `OfflineRenderer`,
+    through a set of `Channel`s. Channels other than drums start on the given preset, until the
+    file changes their program. Events are read from the file as they are needed, so files of
+    any length can be played.
+    """
+    def __init__(self, parent, path, bank=0, number=0):
+        self.parent = parent
+        self.path = path
+        self.channels = parent.new_channels(CHANNELS)
+        for channel in self.channels:
+            if not channel.is_drums:
+                channel.select(bank, number)
+
+    def events(self, start_frame=0):
+        """
+        Yields (frame, channel, event) for every event in the file, in order, with the
+        file starting at `start_frame`.
+        """
+        sample_rate = self.parent.interface.cfg.sample_rate
+        channels = self.channels
+        for secs, channel, event in iter_midi_file(self.path):
+            yield start_frame + round(secs * sample_rate), channels[channel], event
+
+    def play(self, lead=0.2):
+        """
+        Play the file in real time, blocking until every event has been sent. Each event is
+        sent `lead` seconds before it's due and scheduled for its exact frame, so it plays
+        on time as long as this thread wakes up within `lead` of when it asked to.
+        """
+        mixer = self.parent.interface
+        sample_rate = mixer.cfg.sample_rate
+        start_frame = mixer.frame + int(lead * sample_rate)
+        start_time = time.perf_counter()
+
+        for frame, channel, event in self.events(start_frame):
+            # Event times are relative to start_frame, which is already `lead` ahead of now
+            wait = start_time + (frame - start_frame) / sample_rate - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            channel.send_event(event, frame)
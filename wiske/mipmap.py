@@ -0,0 +1,92 @@
+"""
+Octave pyramids of samples, for playing them far above their original pitch.
+
+Level n of a pyramid is the sample low pass filtered and decimated by 2 ** n. A note pitched
+up by an octave or more plays from the level that brings its ratio back into (0.5, 1], which
+keeps frequencies that would alias out of the result, and reads far fewer points per output
+sample.
+Levels are only built when a note first needs them, and are shared by every note playing the
+same data.
+"""
+
+from math import ceil, log2
+
+import numpy as np
+
+
+MAX_LEVEL = 6               # 64 times lower, about 6 octaves
+MIN_LEVEL_LENGTH = 16       # samples; don't go below this
+CACHE_SIZE = 256
+
+# Half band low pass, as a Blackman windowed sinc. Every other tap (bar the middle one) is zero,
+# which is what makes decimating by two with it cheap.
+FILTER_TAPS = 31
+
+
+def half_band_filter():
+    n = np.arange(FILTER_TAPS) - FILTER_TAPS // 2
+    window = np.blackman(FILTER_TAPS)
+    taps = 0.5 * np.sinc(0.5 * n) * window
+    return (taps / taps.sum()).astype(np.float32)
+
+HALF_BAND = half_band_filter()
+
+# How far past a point the filter reaches, in points of the level it's applied to
+FILTER_REACH = FILTER_TAPS // 2
+
+pyramids = {}
+
+
+def level_for_ratio(ratio, length):
+    """
+    The level to play a sample `length` points long at, at `ratio` times its original speed.
+
+    Rounding up means nothing aliases, at the cost of losing up to the top octave of what would
+    be audible. Below an octave up that would dull notes only just above their root, so level 0
+    is played as it is without mipmaps, and aliases the same.
+    """
+    if ratio < 2:
+        return 0
+    level = min(ceil(log2(ratio)), MAX_LEVEL)
+    while level > 0 and length >> level < MIN_LEVEL_LENGTH:
+        level -= 1
+    return level
+
+
+def decimate(data):
+    """
+    Filter out the top half of the spectrum, then drop every other point. Stereo data is done
+    a channel at a time.
+    """
+    if data.ndim > 1:
+        return np.stack([decimate(data[:, channel]) for channel in range(data.shape[1])], axis=1)
+    filtered = np.convolve(data, HALF_BAND, mode="same")
+    return filtered[::2]
+
+
+def get_level(key, data, level):
+    """
+    Level `level` of the pyramid for `data`, which is identified by `key`. Level 0 is `data`
+    itself.
+    """
+    if level == 0:
+        return data
+
+    levels = pyramids.get(key)
+    if levels is None:
+        if len(pyramids) >= CACHE_SIZE:
+            pyramids.clear()
+        levels = pyramids[key] = [data]
+
+    while len(levels) <= level:
+        levels.append(decimate(levels[-1].astype(np.float32)))
+    return levels[level]
+
+
+def guard_reach(level, reach):
+    """
+    How many points past the end of a loop need to be in the unrolled loop that level `level`
+    is built from, for `reach` points of it to be readable past the loop end.
+    """
+    # Each level's filter reaches a little further into the level below
+    return (reach + 2 * FILTER_REACH + 1) << level
@@ -1,13 +1,20 @@
 
-from math import ceil, pi, log10
-import struct
+from math import pi
+import copy
 import time
 
+import numpy as np
+
 from .repitch import cents_to_ratio
-from .sf2.definitions import SFGenerator, LoopType, SFGeneralController, SFModPolarity, SFModDirection, SFTransform, SFModType
+from .sf2.definitions import SFGenerator, LoopType, SFGeneralController, SFTransform
 from .interface import CustomBuffer
-from .sf2.convertors import timecents_to_secs, decibels_to_atten, cents_to_hertz
+from .sf2.convertors import timecents_to_secs, decibels_to_atten, cents_to_hertz, semitones_to_wheel_sens, pan_to_gains
+from .sf2.conversion_tables import map_controller, MIDI_RANGE
 from .envelope import Envelope
+from .samples_cache import unrolled_loop, stereo_pair
+from .block import EMPTY_BLOCK, advance_positions, envelope_block, one_pole_block
+from .interpolation import Interpolation, TABLES, TABLE_RESOLUTION, interpolate, MAX_REACH
+from .mipmap import level_for_ratio, get_level, guard_reach
 from .util.logger import logger
 
 
@@ -15,9 +22,52 @@ COARSE_SIZE = 2 ** 15
 BASE_SAMPLE_RATE = 44100
 SINGLE_SAMPLE_LEN = 1 / BASE_SAMPLE_RATE
 
+# Default to MIDI 127 for no real reason
+DEFAULT_MOD_INPUT = 127
+
+
+# id(modulator list): (modulator list, compiled tables). Every note in a zone shares the same list.
+compiled_modulators = {}
+COMPILED_CACHE_SIZE = 1024
+
+
+def compile_modulators(mods):
+    """
+    Index `mods` by the inputs they read and by the generators they add to, so that a change to
+    one input only touches the modulators and generators that depend on it.
+    Returns ({input: [modulator index]}, {generator: [modulator index]}), which must not be
+    modified.
+    """
+    # Keeping hold of the list means its id can't be reused while it's in the cache
+    cached = compiled_modulators.get(id(mods))
+    if cached is not None and cached[0] is mods:
+        return cached[1]
+
+    sources = {}
+    dests = {}
+    for i in range(len(mods)):
+        mod = mods[i]
+        sources.setdefault(mod.src.controller, []).append(i)
+        if mod.amt_src.controller != mod.src.controller:
+            sources.setdefault(mod.amt_src.controller, []).append(i)
+
+        # Links to other modulators aren't supported
+        if isinstance(mod.dest, SFGenerator):
+            dests.setdefault(mod.dest, []).append(i)
+
+    if len(compiled_modulators) >= COMPILED_CACHE_SIZE:
+        compiled_modulators.clear()
+    compiled_modulators[id(mods)] = (mods, (sources, dests))
+    return sources, dests
+
 
 class Note:
-    def __init__(self, inter, key, on_vel, sample, gens, mods):
+    """
+    A note playing a sample, or both halves of a stereo pair if `link` is given as (the other
+    sample, its pan) (see `Zone.linked`). A pair is played as a single sample with a column per
+    channel, so everything but reading and filtering the data is only done once for both.
+    """
+    def __init__(self, inter, key, on_vel, sample, gens, mods, link=None):
         self.inter = inter
         self.sample = sample
         self.key = key
@@ -28,6 +78,8 @@ class Note:
 
         self.playback = None
         self.position = 0
+        self.looped = False     # been round the loop, see `collect`
+        self.in_loop_data = False   # playing from the copy of the loop, see `update_sample_data`
 
         # SoundFont spec 2.01, 8.1.2
         # SFGenerator.overridingRootKey:
@@ -37,11 +89,10 @@ class Note:
         #  range 0-127, then the indicated key number will cause the sample to be played back at
         #  its sample header Sample Rate"
         original_key = self.sample.pitch if self.gens[SFGenerator.overridingRootKey] == -1 else self.gens[SFGenerator.overridingRootKey]
-        self.hard_pitch_diff = (self.key - original_key) * 100 + self.sample.pitch_correction
-        self.hard_pitch_diff += self.gens[SFGenerator.coarseTune] * 100 + self.gens[SFGenerator.fineTune]
-
-        sample_ratio = self.sample.sample_rate / BASE_SAMPLE_RATE
-        self.total_ratio = sample_ratio * cents_to_ratio(self.hard_pitch_diff)
+        self.base_pitch_diff = (self.key - original_key) * 100 + self.sample.pitch_correction
+        self.sample_ratio = self.sample.sample_rate / BASE_SAMPLE_RATE
+        self.hard_pitch_diff = None
+        self.recalculate_pitch()
 
         offset_s = self.gens[SFGenerator.startAddrsOffset] + self.gens[SFGenerator.startAddrsCoarseOffset] * COARSE_SIZE
         offset_e = self.gens[SFGenerator.endAddrsOffset] + self.gens[SFGenerator.endAddrsCoarseOffset] * COARSE_SIZE
@@ -51,10 +102,22 @@ class Note:
         loop_offset_s -= offset_s
         loop_offset_e -= offset_s
 
-        self.sample_data = struct.unpack(
-            "<{}h".format(self.get_data_size(sample.data, offset_s, offset_e) // 2),
-            self.frame_sample_data(sample.data, offset_s, offset_e)
-        )
+        # A view into the soundfont's sample pool, so nothing is copied or decoded here. Stereo
+        # pairs are copied into a (left, right) array once, and shared by every note.
+        # `source` tells the data apart in caches.
+        data = sample.data
+        self.source = sample
+        self.link_sample = None
+        if link is not None:
+            self.link_sample, link_pan = link
+            self.source = (sample, self.link_sample) if sample.is_left else (self.link_sample, sample)
+            data = stereo_pair(*self.source)
+
+            # Modulators move both halves together, keeping them the same distance apart
+            self.link_pan_offset = link_pan - self.gens[SFGenerator.pan]
+
+        self.sample_offset = offset_s
+        self.sample_data = self.frame_sample_data(data, offset_s, offset_e)
         self.sample_size = len(self.sample_data)
 
         self.loop = None
@@ -64,7 +127,13 @@ class Note:
                 self.sample.loop[1] + loop_offset_e,
             ]
 
-        self.vol_env = Envelope(
+            # Some soundfonts have loops with no length, which can't be played as a loop
+            if self.loop[1] - self.loop[0] < 1:
+                self.loop = None
+        self.build_levels()
+        self.update_sample_data()
+
+        self.vol_env_times = (
             timecents_to_secs(self.gens[SFGenerator.delayVolEnv]),
             timecents_to_secs(self.gens[SFGenerator.attackVolEnv]),
             timecents_to_secs(self.gens[SFGenerator.holdVolEnv]),
@@ -72,9 +141,11 @@ class Note:
             decibels_to_atten(self.gens[SFGenerator.sustainVolEnv] / 10),   # sus uses cB = 1/10 dB
             timecents_to_secs(self.gens[SFGenerator.releaseVolEnv]),
         )
+        self.vol_env = Envelope(*self.vol_env_times)
 
-        self.channel_ratio = 2      # TODO do this properly
+        self.out_channels = inter.cfg.channels if inter is not None else 2
         self.single_sample_len = SINGLE_SAMPLE_LEN
+        self.recalculate_pan()
 
         # LOW PASS cutoff
         self.recalculate_cutoff()
@@ -87,11 +158,9 @@ class Note:
         # print("gens")
         # for g in self.gens:
         #     print(">",g,self.gens[g])
-
-        print("\n\nmods")
-        for m in self.mods:
-            print(">",m)
-
+        # print("\n\nmods")
+        # for m in self.mods:
+        #     print(">",m)
         # print("\nsample:", self.sample)
 
         self.last_mod_inputs = {
@@ -100,27 +169,203 @@ class Note:
             SFGeneralController.noteOnVel: on_vel,
             SFGeneralController.polyPressure: 127,  # todo should be on_vel?
             SFGeneralController.channelPressure: 127,   # todo should be on_vel?
+            SFGeneralController.pitchWheel: 64,
+            SFGeneralController.pitchWheelSens: semitones_to_wheel_sens(2),
+            10: 64,     # MIDI pan, centred
         }
 
+        self.mod_sources, self.mod_dests = compile_modulators(self.mods)
         self.cached_modulator_values_raw = {}
         for i in range(len(self.mods)):
             self.recalculate_modulator(i)
         self.update_mod_destinations()
 
+        # Attenuation actually being played, which follows `atten` smoothly when it changes
+        self.play_atten = self.atten
+
+    def spawn(self, inter, note=None):
+        """
+        Start a new note from this one, which acts as a prototype. Everything resolved from the
+        preset, key and velocity (sample view, loop points, envelope times, attenuation, filter
+        and pitch ratio) is shared, and only the playback state is fresh.
+        If `note` is given, it is reused rather than allocating a new one, along with its
+        envelope, modulation state and buffer.
+        """
+        if note is None:
+            note = copy.copy(self)
+            note.vol_env = Envelope(*self.vol_env_times)
+
+            # Modulation changes these in place, so each note needs its own
+            note.gens = dict(self.gens)
+            note.last_mod_inputs = dict(self.last_mod_inputs)
+            note.cached_modulator_values_raw = dict(self.cached_modulator_values_raw)
+            note.playback = None
+        else:
+            vol_env = note.vol_env
+            mod_inputs = note.last_mod_inputs
+            mod_values = note.cached_modulator_values_raw
+            buffer = note.buffer
+            playback = note.playback
+
+            note.__dict__.update(self.__dict__)
+            note.gens = dict(self.gens)
+            vol_env.reset(*self.vol_env_times)
+            mod_inputs.clear()
+            mod_inputs.update(self.last_mod_inputs)
+            mod_values.clear()
+            mod_values.update(self.cached_modulator_values_raw)
+
+            note.vol_env = vol_env
+            note.last_mod_inputs = mod_inputs
+            note.cached_modulator_values_raw = mod_values
+            note.buffer = buffer
+            note.playback = playback
+
+        note.inter = inter
+        note.position = 0
+        note.looped = False
+        note.in_loop_data = False
+        note.last_val = 0
+        return note
+
+    def build_levels(self):
+        """
+        Build every mipmap level (see mipmap.py) the note could play from, however far its
+        modulators could pitch it up, so that a change in pitch while playing only has to pick
+        one. Building a level filters the whole sample, which is far too slow for the mixing
+        thread, so this is done when the note is resolved, and the note keeps hold of them.
+        """
+        top = 0
+        if self.inter is not None and self.inter.cfg.sample_mipmaps:
+            top = level_for_ratio(self.sample_ratio * cents_to_ratio(self.max_pitch_diff()), self.sample_size)
+
+        self.levels = [
+            get_level((self.source, self.sample_offset, self.sample_size), self.sample_data, level)
+            for level in range(top + 1)
+        ]
+        self.loop_levels = None
+        if self.loop is not None:
+            loop_s, loop_e = self.loop
+            self.loop_levels = []
+            for level in range(top + 1):
+                scale = 1 << level
+                reach = guard_reach(level, MAX_REACH)
+                unrolled, origin = unrolled_loop(self.source, self.sample_offset, self.sample_data, loop_s, loop_e, reach)
+                data = get_level((self.source, self.sample_offset, loop_s, loop_e, len(unrolled)), unrolled, level)
+                # Notes move onto the copy once what they read could reach past the end of the loop
+                self.loop_levels.append((data, origin / scale, (loop_e - reach) / scale))
+
+    def max_pitch_diff(self):
+        """
+        The most cents the note could be pitched by, with every modulator on its tuning at full
+        stretch.
+        """
+        coarse = self.init_gens.get(SFGenerator.coarseTune, 0)
+        fine = self.init_gens.get(SFGenerator.fineTune, 0)
+        for mod in self.mods:
+            if mod.dest == SFGenerator.coarseTune:
+                coarse += abs(mod.amount)
+            elif mod.dest == SFGenerator.fineTune:
+                fine += abs(mod.amount)
+        return self.base_pitch_diff + coarse * 100 + fine
+
+    def update_sample_data(self):
+        """
+        Work out what the note plays from, and how fast. While looping, notes move from their
+        sample onto a copy of the loop repeated past its end (see `unrolled_loop`) as they near
+        the end of the loop, so interpolation never has to wrap. Positions on the copy are still
+        counted from the start of the sample, and once round the loop, they're in the repeat.
+        Notes pitched up an octave or more may play from a decimated copy instead (see
+        mipmap.py), in which case the position, rate and loop are all in points of that copy.
+        Only picks from what `build_levels` made, so it's quick enough for the mixing thread.
+        """
+        level = 0
+        if self.inter is not None and self.inter.cfg.sample_mipmaps:
+            level = min(level_for_ratio(self.total_ratio, self.sample_size), len(self.levels) - 1)
+        scale = self.play_scale = 1 << level
+        self.play_rate = self.total_ratio / scale
+        self.play_end = (self.sample_size - 1) / scale
+        self.play_data = self.levels[level]
+
+        self.play_loop = None
+        self.play_loop_data = None
+        if self.loop is not None:
+            loop_s, loop_e = self.loop
+            self.play_loop = (loop_e / scale, (2 * loop_e - loop_s) / scale)
+            self.play_loop_data, self.play_loop_origin, self.play_loop_switch = self.loop_levels[level]
+
+    def retune(self):
+        """
+        Pick up a change in pitch part way through playing, keeping the same place in the sample
+        even if that means playing from a different mipmap level.
+        """
+        scale = self.play_scale
+        self.update_sample_data()
+        if self.play_scale != scale:
+            self.position *= scale / self.play_scale
+            if self.in_loop_data:
+                # Lower levels move onto the copy of the loop later, so it may be too soon
+                self.in_loop_data = self.position >= self.play_loop_switch
+
+    def recalculate_pitch(self):
+        """
+        Work out how fast to play the sample, returning True if that has changed.
+        """
+        pitch_diff = self.base_pitch_diff + self.gens[SFGenerator.coarseTune] * 100 + self.gens[SFGenerator.fineTune]
+        if pitch_diff == self.hard_pitch_diff:
+            return False
+        self.hard_pitch_diff = pitch_diff
+        self.total_ratio = self.sample_ratio * cents_to_ratio(pitch_diff)
+        return True
+
     def update_mod_input(self, mod_controller, amount):
+        """
+        Change one modulator input, recalculating only the modulators that read it and the
+        generators they add to. Called between periods, so changes take effect from the start
+        of the next block, with attenuation smoothed over it.
+        """
         self.last_mod_inputs[mod_controller] = amount
-        for i in range(self.mods):
-            mod = self.mods[i]
-            if mod.src.controller == mod_controller or mod.amt_src.controller == mod_controller:
-                self.recalculate_modulator(i)
-        self.update_mod_destinations()
+        indices = self.mod_sources.get(mod_controller)
+        if indices is not None:
+            self.recalculate_modulators(indices)
+
+    def set_mod_inputs(self, inputs):
+        """
+        Take on the values of every input in `inputs` that a modulator uses, such as the state of
+        the MIDI channel a note is played on. Only for notes that haven't started playing yet,
+        as nothing is smoothed.
+        """
+        last_inputs = self.last_mod_inputs
+        changed = []
+        for controller, indices in self.mod_sources.items():
+            if controller in inputs and inputs[controller] != last_inputs.get(controller, DEFAULT_MOD_INPUT):
+                last_inputs[controller] = inputs[controller]
+                changed += indices
+
+        if changed:
+            self.recalculate_modulators(changed)
+            self.play_atten = self.atten
+
+    def recalculate_modulators(self, indices):
+        """
+        Recalculate the modulators at `indices`, then the generators they add to.
+        """
+        mods = self.mods
+        mod_dests = self.mod_dests
+        dests = []
+        for i in indices:
+            self.recalculate_modulator(i)
+
+            # Modulators linked to other modulators have no generator to update
+            dest = mods[i].dest
+            if dest in mod_dests and dest not in dests:
+                dests.append(dest)
+        self.update_mod_destinations(dests)
 
     def recalculate_modulator(self, index):
-        # Default to MIDI 127 for no real reason
-        DEFAULT_MIDI_VAL = 127
         mod = self.mods[index]
         primary = mod.src
-        primary_val = self.last_mod_inputs.get(primary.controller, DEFAULT_MIDI_VAL)
+        primary_val = self.last_mod_inputs.get(primary.controller, DEFAULT_MOD_INPUT)
         mapped_primary = self.map_midi(primary_val, primary)
         secondary = mod.amt_src
         mapped_secondary = None
@@ -128,7 +373,7 @@ class Note:
         if secondary.controller == SFGeneralController.noController:
             mapped_secondary = 1
         else:
-            secondary_val = self.last_mod_inputs.get(secondary.controller, DEFAULT_MIDI_VAL)
+            secondary_val = self.last_mod_inputs.get(secondary.controller, DEFAULT_MOD_INPUT)
             mapped_secondary = self.map_midi(secondary_val, secondary)
 
         pre_transform = mapped_primary * mapped_secondary * mod.amount
@@ -164,74 +409,70 @@ Primary
         self.cached_modulator_values_raw[index] = post_transform
 
     def map_midi(self, val, sfmodulator):
-        map_func = None
-        if sfmodulator.type == SFModType.concave:
-            map_func = self.map_concave
-        elif sfmodulator.type == SFModType.convex:
-            map_func = self.map_convex
-        else:
-            map_func = self.map_linear
-
-        if sfmodulator.polarity == SFModPolarity.unipolar:
-            return map_func(val / 128, sfmodulator.direction)
-        else:
-            if val <= 64:
-                return -map_func((64 - val) / 64, sfmodulator.direction)
-            else:
-                return map_func((val - 64) / 64, sfmodulator.direction)
-
-    # All map_* functions and base_conx expect val to be in the range (0, 1)
-    def map_linear(self, val, direction):
-        if direction == SFModDirection.negative:
-            return 1 - val
-        else:
-            return val
-
-    def map_convex(self, val, direction):
-        if direction == SFModDirection.negative:
-            return self.base_conx_function(1 - val)
-        else:
-            return self.base_conx_function(val)
-
-    def map_concave(self, val, direction):
-        if direction == SFModDirection.negative:
-            return 1 - self.base_conx_function(val)
-        else:
-            return 1 - self.base_conx_function(1 - val)
-
-    def base_conx_function(self, val):
-        return log10(9 * val + 1)
-
-    def update_mod_destinations(self):
-        self.reset_gens_to_init()
-        for i in range(len(self.mods)):
-            mod = self.mods[i]
+        # Whole MIDI values are looked up, anything else (like the pitch wheel) is worked out
+        if val.__class__ is int and 0 <= val < MIDI_RANGE:
+            return sfmodulator.curve[val]
+        return map_controller(val, sfmodulator.type, sfmodulator.polarity, sfmodulator.direction)
 
-            if mod.dest == SFGenerator.initialFilterFc:
-                self.gens[mod.dest] += cents_to_hertz(self.cached_modulator_values_raw[i])
+    def update_mod_destinations(self, dests=None):
+        """
+        Work out the generators in `dests` (every one that has modulators if None) from their
+        initial values plus the modulators adding to them, and then anything that depends on
+        those generators.
+        """
+        if dests is None:
+            dests = self.mod_dests
+        values = self.cached_modulator_values_raw
+        retune = False
+        for dest in dests:
+            # Modulators add to the generator, in its own units
+            total = self.init_gens.get(dest, 0)
+            for i in self.mod_dests[dest]:
+                total += values[i]
+            self.gens[dest] = total
+
+            if dest == SFGenerator.initialFilterFc:
                 self.recalculate_cutoff()
-            elif mod.dest == SFGenerator.initialAttenuation:
-                print("adding atten {:.2f}cB to {:.2f}cB from mod {}".format(self.cached_modulator_values_raw[i], self.gens[mod.dest], i))
-                self.gens[mod.dest] += self.cached_modulator_values_raw[i]
+            elif dest == SFGenerator.initialAttenuation:
                 self.recalculate_atten()
-            else:
-                pass # print("Unhandled dest:", mod.dest)
+            elif dest == SFGenerator.fineTune or dest == SFGenerator.coarseTune:
+                retune = True
+            elif dest == SFGenerator.pan:
+                self.recalculate_pan()
             # TODO a lot of stuff here
 
+        if retune and self.recalculate_pitch():
+            self.retune()
+
     def reset_gens_to_init(self):
-        self.gens = {}
-        for gen in self.init_gens:    # make shallow copy
-            self.gens[gen] = self.init_gens[gen]
+        # Copying a whole dict reuses its hashes, which matters with enum keys
+        self.gens = dict(self.init_gens)
 
     def recalculate_cutoff(self):
-        print("filter is", cents_to_hertz(self.gens[SFGenerator.initialFilterFc]))
         self.cutoff_time_const = 1 / (2 * pi * cents_to_hertz(self.gens[SFGenerator.initialFilterFc]))
         self.cutoff_alpha = SINGLE_SAMPLE_LEN / (SINGLE_SAMPLE_LEN + self.cutoff_time_const)
 
     def recalculate_atten(self):
         self.atten = decibels_to_atten(self.gens[SFGenerator.initialAttenuation] / 10)
-        print("calc atten = {:.5f} from {:.2f}cB".format(self.atten, self.gens[SFGenerator.initialAttenuation]))
-        # self.atten = 1
+
+    def recalculate_pan(self):
+        """
+        Work out how much of each channel of the sample data goes to each output channel, as a
+        matrix with a row per data channel and a column per output channel.
+        """
+        if self.out_channels == 1:
+            # Nowhere to pan to, so just mix the channels together
+            channels = 1 if self.link_sample is None else 2
+            self.pan_matrix = np.full((channels, 1), 1 / channels)
+            return
+
+        pan = self.gens[SFGenerator.pan]
+        if self.link_sample is None:
+            self.pan_matrix = np.array([pan_to_gains(pan)])
+        elif self.sample.is_left:
+            self.pan_matrix = np.array([pan_to_gains(pan), pan_to_gains(pan + self.link_pan_offset)])
+        else:
+            self.pan_matrix = np.array([pan_to_gains(pan + self.link_pan_offset), pan_to_gains(pan)])
 
     def frame_sample_data(self, data, offset_s, offset_e):
         if offset_e == 0:
@@ -250,73 +491,183 @@ Primary
             return len(data) - offset_s + offset_e
 
     def play(self):
-        if not self.sample.is_mono:
-            print("Stereo samples are not supported yet")
-            return
-
-        self.playback = self.inter.add_custom_buffer(CustomBuffer(self.loop is not None), self.collect)
+        self.buffer = CustomBuffer(self.loop is not None)
+        self.playback = self.inter.add_custom_buffer(self.buffer, self.collect_block)
 
     def stop(self):
         self.vol_env.release()
 
+    def collect_block(self, size, looping):
+        """
+        Render a whole period of this note at once, as a NumPy array of `size` interleaved values
+        (or fewer, if a non-looping sample runs out). This is what gets mixed during playback;
+        `collect` is the per-sample reference implementation that this must match.
+        """
+        if self.vol_env.finished:
+            # This runs on the mixing thread, so the buffer can be changed directly
+            self.buffer.end_loop()
+            self.buffer.finished = True
+            return EMPTY_BLOCK
+
+        out_channels = self.out_channels
+        loop_s, loop_e = self.play_loop if self.play_loop is not None else (0, 0)
+        if self.in_loop_data and not looping:
+            # The loop was ended part way round, so carry on from the same place in the sample
+            if self.position >= loop_s:
+                self.position -= loop_e - loop_s
+            self.in_loop_data = False
+
+        positions, self.position = advance_positions(
+            self.position, self.play_rate, -(-size // out_channels), looping, loop_s, loop_e, self.play_end
+        )
+        frames = len(positions)
+        if frames == 0:
+            # A sample that isn't looping has run out, so there's nothing left to play
+            self.buffer.finished = True
+            return EMPTY_BLOCK
+
+        # Envelope and attenuation are per frame, so they're combined before touching the data
+        gains = envelope_block(self.vol_env, frames, self.single_sample_len)
+        atten = self.atten
+        if atten != self.play_atten:
+            # Ramp to the new attenuation over the block, rather than jumping and clicking
+            gains *= np.linspace(self.play_atten, atten, frames)
+            self.play_atten = atten
+        else:
+            gains *= atten
+
+        mode = self.inter.cfg.interpolation
+        if self.in_loop_data:
+            values = interpolate(self.play_loop_data, positions - self.play_loop_origin, mode)
+        elif not looping:
+            values = interpolate(self.play_data, positions, mode)
+        else:
+            # Move onto the copy of the loop before reading anything past the end of the loop.
+            # Positions only go back once they're past it, so those before the switch come first.
+            switch = self.play_loop_switch
+            ahead = int(np.count_nonzero(positions < switch))
+            values = interpolate(self.play_data, positions[:ahead], mode)
+            if ahead < frames:
+                on_loop = interpolate(self.play_loop_data, positions[ahead:] - self.play_loop_origin, mode)
+                values = np.concatenate((values, on_loop))
+            self.in_loop_data = self.position >= switch
+        if values.ndim > 1:
+            values *= gains[:, np.newaxis]
+        else:
+            values *= gains
+
+        filtered = one_pole_block(values, self.cutoff_alpha, self.last_val)
+        self.last_val = filtered[-1]
+
+        # Pan into interleaved output frames
+        return filtered.reshape(frames, -1).dot(self.pan_matrix).ravel()
+
     def collect(self, size, looping):
         """
         This function is extremely time sensitive, especially inside the while loop.
         Anything goes in terms of optimization. Even a tiny change can make a significant
         difference. Maintainability and clean code is secondary to performance here.
+
+        This is no longer used for playback, but is kept as the reference implementation
+        for `collect_block`.
         """
         if self.vol_env.finished:
-            self.inter.end_loop(self.playback)  # TODO thread this?
-            # also, this no longer actually sets the buffer to 'finished'. Fix this.
+            self.buffer.end_loop()
+            self.buffer.finished = True
             return
 
-        channel_ratio = self.channel_ratio
+        out_channels = self.out_channels
         rate = self.total_ratio
 
         count = 0
-        offset = ceil(rate)
+        offset = 1      # interpolate with the next point, whatever the rate
         end = self.sample_size - offset
 
         # Whole load of local variables for optimization
         time_diff = self.single_sample_len
         loop = self.loop
-        data = self.sample_data
+        # Plain ints, since arithmetic on numpy's int16s would overflow. This is no longer on
+        # the playback path, so the copy is fine.
+        data = self.sample_data.tolist()
         position = self.position
         vol_env = self.vol_env
         ve_phase, ve_position, ve_start_val, ve_current_val, ve_target_val, ve_total_time = vol_env.get_init_vals()
 
-        two_ratio = channel_ratio == 2
-
-        loop_s = loop[0]
-        loop_e = loop[1]
+        # What each output channel takes from each channel of the data
+        stereo = self.link_sample is not None
+        pan_columns = list(zip(*self.pan_matrix.tolist()))
+
+        loop_s, loop_e = loop if loop is not None else (0, 0)
+        loop_len = loop_e - loop_s
+        looped = self.looped
+
+        # Points either side of the one being interpolated from, for modes reading more than two
+        mode = self.inter.cfg.interpolation
+        if mode != Interpolation.LINEAR:
+            table, start = TABLES[mode]
+            table = table.tolist()
+            reach = range(start, start + len(table[0]))
+            last_point = len(data) - 1
+
+            def point(j):
+                # Once round the loop, reading before its start wraps back to its end, as well as
+                # reading past its end wrapping to its start
+                if looping and j >= loop_e:
+                    j = loop_s + (j - loop_e) % loop_len
+                elif looped and j < loop_s:
+                    j = loop_e - 1 - (loop_s - 1 - j) % loop_len
+                return data[min(max(j, 0), last_point)]
 
         to_int = int   # this cuts a tiny sliver of time off the total running time
 
         # last_raw = self.last_val_raw
         last = self.last_val
+        last_l, last_r = (last, last) if not isinstance(last, np.ndarray) else last.tolist()
         cutoff_alpha = self.cutoff_alpha
         reverse_cutoff_alpha = 1 - cutoff_alpha
         atten = self.atten
         while (looping or position < end) and count < size:
             i = to_int(position)
             frac = position - i
-            s1 = data[i]
-            # If adding the offset overshoots the end of the sample loop, make sure that we wrap back arround
-            # to the start of the loop again. Enjoy the horrible conditional.
-            s2 = data[i + offset if not looping or i + offset < loop_e else loop_s + (i + offset - loop_e)]
-            val = (s1 + (s2 - s1) * frac) * ve_current_val * atten
+            if mode == Interpolation.LINEAR:
+                s1 = data[i]
+                # If adding the offset overshoots the end of the sample loop, make sure that we wrap back arround
+                # to the start of the loop again. Enjoy the horrible conditional.
+                s2 = data[i + offset if not looping or i + offset < loop_e else loop_s + (i + offset - loop_e)]
+                if stereo:
+                    val_l = s1[0] + (s2[0] - s1[0]) * frac
+                    val_r = s1[1] + (s2[1] - s1[1]) * frac
+                else:
+                    val = s1 + (s2 - s1) * frac
+            else:
+                weights = table[to_int(frac * TABLE_RESOLUTION + 0.5)]
+                points = [point(i + k) for k in reach]
+                if stereo:
+                    val_l = sum(p[0] * w for p, w in zip(points, weights))
+                    val_r = sum(p[1] * w for p, w in zip(points, weights))
+                else:
+                    val = sum(p * w for p, w in zip(points, weights))
+
+            if stereo:
+                gain = ve_current_val * atten
+                last_l = cutoff_alpha * val_l * gain + reverse_cutoff_alpha * last_l
+                last_r = cutoff_alpha * val_r * gain + reverse_cutoff_alpha * last_r
+                for left_gain, right_gain in pan_columns:
+                    yield last_l * left_gain + last_r * right_gain
+            else:
+                val *= ve_current_val * atten
 
-            with_filter = cutoff_alpha * val + reverse_cutoff_alpha * last
-            last = with_filter
+                with_filter = cutoff_alpha * val + reverse_cutoff_alpha * last
+                last = with_filter
 
-            yield with_filter
-            if two_ratio:
-                yield with_filter
-            count += channel_ratio
+                for (gain,) in pan_columns:
+                    yield with_filter * gain
+            count += out_channels
 
             position += rate
-            if looping and position > loop_e:
+            if looping and position >= loop_e:
                 position = loop_s + (position - loop_e)
+                looped = True
 
             if ve_phase not in (4, 6): # sustain, finished
                 ve_position += time_diff
@@ -327,7 +678,11 @@ Primary
                 else:
                     ve_current_val = ve_start_val + (ve_target_val - ve_start_val) * (ve_position / ve_total_time)
 
+        if count == 0:
+            self.buffer.finished = True     # ran out of sample, as in `collect_block`
+
         self.position = position
-        self.last_val = last
+        self.looped = looped and looping
+        self.last_val = np.array([last_l, last_r]) if stereo else last
 
         vol_env.update_vals((ve_phase, ve_position, ve_start_val, ve_current_val, ve_target_val, ve_total_time))
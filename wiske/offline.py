@@ -0,0 +1,115 @@
+from .sf2.soundfont import Soundfont
+from .interface import Mixer, AudioConfig, AudioSink, WavFileSink
+from .instrument import Instrument
+from .channel import Channel, CHANNELS
+from .voice_cache import VoiceCache
+from .voice_pool import VoicePool
+from .parallel import ParallelVoicePool
+from .midi_player import MidiPlayer
+
+from .util.logger import logger
+
+
+class OfflineRenderer:
+    """
+    Renders to a WAV file as fast as the CPU allows, rather than in real time to a sound card.
+    Takes the place of `Synthesizer` as the parent of any instruments it creates, so notes are
+    started and rendered exactly as they would be during live playback.
+
+    With `workers`, voices are rendered by that many processes at once (see parallel.py), in
+    which case `close` should be called once finished with.
+    """
+    def __init__(self, sfont, config=None, max_polyphony=64, workers=0):
+        if isinstance(sfont, Soundfont):
+            self.sfont = sfont
+        else:
+            self.sfont = Soundfont(sfont)
+
+        if config is None:
+            config = AudioConfig()
+            config.period_size = 128
+        self.cfg = config
+        self.interface = Mixer(config)
+        self.voice_cache = VoiceCache()
+        if workers:
+            self.voices = ParallelVoicePool(self.interface, self.sfont.reader.filename, workers, max_polyphony)
+        else:
+            self.voices = VoicePool(self.interface, max_polyphony)
+
+    def new_instrument(self, bank, number):
+        return Instrument(self, bank, number)
+
+    def new_channels(self, count=CHANNELS):
+        """
+        A set of MIDI channels, see `Channel`.
+        """
+        return [Channel(self, i) for i in range(count)]
+
+    def render(self, target, events, tail=2):
+        """
+        Render `events`, a list of (time in seconds, instrument or channel, event) tuples, to `target`,
+        which is either a path to write a WAV file to or an `AudioSink`. Each event is played at
+        the frame its time falls on, the same as it would be if it was scheduled for that frame
+        during live playback. After the last event, rendering carries on until every note has
+        finished, or for at most `tail` seconds.
+        Returns the length of the render in seconds.
+        """
+        start = self.interface.frame
+        sample_rate = self.cfg.sample_rate
+        timeline = sorted(events, key=lambda x: x[0])
+        return self.render_frames(
+            target, ((start + round(secs * sample_rate), instrument, event) for secs, instrument, event in timeline), tail
+        )
+
+    def render_frames(self, target, timeline, tail=2):
+        """
+        Like `render`, but `timeline` is an iterable of (frame, instrument, event) tuples that
+        are already in order, with frames counted the same way as `Mixer.frame`. It's only read
+        a period ahead of the render, so it can be a generator of any length.
+        """
+        cfg = self.cfg
+        mixer = self.interface
+        period_secs = cfg.period_size / cfg.sample_rate
+        timeline = iter(timeline)
+
+        sink = target if isinstance(target, AudioSink) else WavFileSink(target)
+        sink.open(cfg, 0)
+        try:
+            periods = 0
+            upcoming = next(timeline, None)
+            while upcoming is not None:
+                # Only send the events in the next period, so voices aren't taken up long
+                # before their notes start
+                period_end = mixer.frame + cfg.period_size
+                while upcoming is not None and upcoming[0] < period_end:
+                    frame, instrument, event = upcoming
+                    instrument.send_event(event, frame)
+                    upcoming = next(timeline, None)
+
+                sink.write(mixer.mix_period())
+                periods += 1
+
+            tail_periods = int(tail / period_secs)
+            while tail_periods > 0 and not mixer.is_silent:
+                sink.write(mixer.mix_period())
+                periods += 1
+                tail_periods -= 1
+        finally:
+            sink.close()
+
+        logger.info("Offline render: {} periods to {}".format(periods, target))
+        return periods * period_secs
+
+    def close(self):
+        if isinstance(self.voices, ParallelVoicePool):
+            self.voices.close()
+            self.interface.handle_messages()
+            self.interface.close_retired_workers()
+
+    def render_midi(self, midi_path, target, bank=0, number=0, tail=2):
+        """
+        Render a standard MIDI file to `target` (see `render`). Channels start on the given
+        preset, until the file changes their program. The file is streamed, see `MidiPlayer`.
+        """
+        player = MidiPlayer(self, midi_path, bank, number)
+        return self.render_frames(target, player.events(self.interface.frame), tail)
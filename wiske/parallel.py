@@ -0,0 +1,314 @@
+import multiprocessing
+from multiprocessing import shared_memory
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+from .sf2.soundfont import Soundfont
+from .interface import Mixer, AudioConfig, NullSink
+from .interface.message import MessageType
+from .instrument import Instrument
+from .voice_cache import VoiceCache
+from .voice_pool import VoicePool
+
+from .util.logger import logger
+
+
+# Workers are started from a clean server process rather than forked from this one, which may
+# have other threads running, such as the playback thread, whose locks a fork would copy held
+WORKER_CONTEXT = multiprocessing.get_context("forkserver")
+WORKER_CONTEXT.set_forkserver_preload([__name__])
+
+# Not an enum for performance reasons
+class WorkerCommand:
+    NOTE_ON = 0         # bank, preset number, key, velocity, mod inputs
+    NOTE_OFF = 1        # key
+    MOD_INPUT = 2       # controller, value
+    ALL_NOTES_OFF = 3
+
+
+class WorkerParent:
+    """
+    Takes the place of `Synthesizer` in a worker process, as the parent of its instruments.
+    """
+    def __init__(self, sfont, interface, max_polyphony):
+        self.sfont = sfont
+        self.interface = interface
+        self.voice_cache = VoiceCache()
+        self.voices = VoicePool(interface, max_polyphony)
+
+
+def run_worker(path, audio_format, slab_name, index, conn, max_polyphony):
+    """
+    Runs in each worker process. Every period, it's sent the frame the period starts at and a
+    list of (`WorkerCommand`, owner number, frame, *args) commands, which it plays on its own
+    voices before mixing them into its row of the shared slab. It replies with the number of
+    voices it still has playing or waiting to start.
+    """
+    sample_rate, channels, period_size, interpolation, sample_mipmaps = audio_format
+    cfg = AudioConfig(sample_rate, channels, period_size, NullSink(), interpolation, sample_mipmaps)
+    mixer = Mixer(cfg)
+    words = mixer.period_size_words
+
+    # Mix straight into shared memory
+    slab_shm = shared_memory.SharedMemory(name=slab_name)
+    mixer.mix_bus = np.ndarray((words,), dtype=np.float32, buffer=slab_shm.buf, offset=index * words * 4)
+
+    # The soundfont is memory mapped, so every worker shares the same sample data
+    parent = WorkerParent(Soundfont(path), mixer, max_polyphony)
+    voices = parent.voices
+    instruments = {}
+    owners = {}     # stand-ins for the instruments and channels in the main process
+    while True:
+        period = conn.recv()
+        if period is None:
+            break
+
+        # Keep in step with the main mixer, which may have been running before this started
+        mixer.frame, commands = period
+        for command, owner_id, frame, *args in commands:
+            owner = owners.get(owner_id)
+            if owner is None:
+                owner = owners[owner_id] = object()
+
+            if command == WorkerCommand.NOTE_ON:
+                bank, number, key, vel, mod_inputs = args
+                instrument = instruments.get((bank, number))
+                if instrument is None:
+                    instrument = instruments[(bank, number)] = Instrument(parent, bank, number)
+                instrument.note_on(key, vel, frame, owner, mod_inputs)
+            elif command == WorkerCommand.NOTE_OFF:
+                voices.note_off(owner, args[0], frame)
+            elif command == WorkerCommand.MOD_INPUT:
+                voices.set_mod_input(owner, args[0], args[1], frame)
+            elif command == WorkerCommand.ALL_NOTES_OFF:
+                voices.all_notes_off(owner, frame)
+
+        mixer.handle_messages()
+        mixer.mix_buffers()
+        conn.send(mixer.live_count + len(mixer.scheduled))
+
+        # Forget owners with nothing left to play, who a new stand-in would do just as well for
+        if owners:
+            in_use = {voice.owner for voice in voices.voices if not voice.free}
+            owners = {number: owner for number, owner in owners.items() if owner in in_use}
+
+    del mixer.mix_bus
+    slab_shm.close()
+
+
+class WorkerPool:
+    """
+    The main process' side of the workers. Each has a row of a shared slab of float32
+    periods, which `finish_period` sums into the mix bus. Only used by the mixing thread.
+
+    A worker that stops responding, say because its process died, is dropped along with
+    whatever it was playing, and the rest carry on.
+
+    Workers are told to stop with `stop`, which is quick enough for the mixing thread, but
+    `close` waits for them to exit, so belongs on another thread.
+    """
+    def __init__(self, cfg, path, count, max_polyphony):
+        words = cfg.period_size * cfg.channels
+        self.slab_shm = shared_memory.SharedMemory(create=True, size=count * words * 4)
+        self.slab = np.ndarray((count, words), dtype=np.float32, buffer=self.slab_shm.buf)
+        self.slab.fill(0)
+        self.total = np.zeros(words, dtype=np.float32)
+
+        self.pending = [[] for _ in range(count)]
+        self.live = [0] * count
+        self.periods = 0
+
+        audio_format = (cfg.sample_rate, cfg.channels, cfg.period_size, cfg.interpolation, cfg.sample_mipmaps)
+        per_worker = -(-max_polyphony // count)
+        self.conns = []
+        self.processes = []
+        self.stopped = False
+        for i in range(count):
+            conn, child_conn = WORKER_CONTEXT.Pipe()
+            process = WORKER_CONTEXT.Process(
+                target=run_worker,
+                args=(path, audio_format, self.slab_shm.name, i, child_conn, per_worker),
+                daemon=True,
+            )
+            process.start()
+            # Otherwise the pipe stays open if the worker dies, and `recv` waits forever
+            child_conn.close()
+            self.conns.append(conn)
+            self.processes.append(process)
+
+        logger.info("Worker pool: {} workers with {} voices each".format(count, per_worker))
+
+    @property
+    def count(self):
+        return len(self.conns)
+
+    @property
+    def alive(self):
+        """
+        The workers that haven't been dropped.
+        """
+        return [i for i, conn in enumerate(self.conns) if conn is not None]
+
+    @property
+    def live_count(self):
+        return sum(self.live)
+
+    @property
+    def busy(self):
+        """
+        True if any worker is playing anything, or has commands waiting.
+        """
+        return self.live_count > 0 or any(self.pending)
+
+    def send(self, worker, command):
+        if self.conns[worker] is not None:
+            self.pending[worker].append(command)
+
+    def start_period(self, frame):
+        pending = self.pending
+        for i, conn in enumerate(self.conns):
+            if conn is None:
+                continue
+            try:
+                conn.send((frame, pending[i]))
+            except OSError as e:
+                self.drop(i, e)
+            pending[i] = []
+
+    def finish_period(self, bus):
+        live = self.live
+        for i, conn in enumerate(self.conns):
+            if conn is None:
+                continue
+            try:
+                live[i] = conn.recv()
+            except (EOFError, OSError) as e:
+                self.drop(i, e)
+        np.sum(self.slab, axis=0, out=self.total)
+        bus += self.total
+        self.periods += 1
+
+    def drop(self, worker, error):
+        """
+        Stop using `worker`, which has stopped responding, and silence its row of the slab.
+        """
+        logger.error("Worker {} stopped responding ({}), dropping its {} voices".format(
+            worker, repr(error), self.live[worker]))
+        self.conns[worker].close()
+        self.conns[worker] = None
+        self.pending[worker] = []
+        self.live[worker] = 0
+        self.slab[worker].fill(0)
+
+    def stop(self):
+        """
+        Tell the workers to exit, without waiting for them.
+        """
+        if self.stopped:
+            return
+        self.stopped = True
+        for conn in self.conns:
+            if conn is None:
+                continue
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+
+    def close(self):
+        """
+        Stop the workers and wait for them to exit, then free the slab.
+        """
+        self.stop()
+        for process in self.processes:
+            process.join()
+        del self.slab
+        self.slab_shm.close()
+        self.slab_shm.unlink()
+
+
+class ParallelVoicePool:
+    """
+    Used in place of `VoicePool` to spread voices across `workers` processes, each rendering
+    its share into shared memory, so rendering isn't limited to a single core by the GIL.
+    Notes go to whichever worker has the fewest playing. `max_polyphony` is split evenly
+    between the workers, and each steals voices from its own share.
+
+    Workers resolve notes themselves, so they're sent the preset, key and velocity rather
+    than a prototype. Owners are sent as numbers, which unlike `id` are never reused.
+
+    Workers don't fork from this process (see `WORKER_CONTEXT`), so scripts using them need
+    the usual `if __name__ == "__main__":` guard.
+    """
+    def __init__(self, inter, path, workers, max_polyphony=64):
+        self.inter = inter
+        self.workers = WorkerPool(inter.cfg, path, workers, max_polyphony)
+        self.max_polyphony = workers * -(-max_polyphony // workers)
+        inter.send(MessageType.SET_WORKERS, self.workers)
+
+        # Notes sent to each worker since it last reported how many it's playing
+        self.sent = [0] * workers
+        self.sent_period = 0
+
+        self.owner_numbers = WeakKeyDictionary()
+        self.next_owner_number = 0
+
+    @property
+    def active(self):
+        return self.workers.live_count
+
+    def owner_number(self, owner):
+        number = self.owner_numbers.get(owner)
+        if number is None:
+            number = self.owner_numbers[owner] = self.next_owner_number
+            self.next_owner_number += 1
+        return number
+
+    def play(self, owner, instrument, key, vel, frame=None, mod_inputs=None):
+        """
+        Play `key` at `vel` on `instrument` for `owner` (see `VoicePool.play`), in whichever
+        worker has the fewest notes playing.
+        """
+        workers = self.workers
+        if self.sent_period != workers.periods:
+            self.sent_period = workers.periods
+            self.sent = [0] * workers.count
+
+        alive = workers.alive
+        if not alive:
+            logger.warning("No workers left to play key {}".format(key))
+            return
+
+        live = workers.live
+        sent = self.sent
+        worker = min(alive, key=lambda i: live[i] + sent[i])
+        sent[worker] += 1
+
+        preset = instrument.preset
+        command = (
+            WorkerCommand.NOTE_ON, self.owner_number(owner), frame,
+            preset.bank, preset.preset_num, key, vel, mod_inputs,
+        )
+        self.inter.send(MessageType.WORKER_COMMAND, worker, command)
+
+    def note_off(self, owner, key, frame=None):
+        self.broadcast((WorkerCommand.NOTE_OFF, self.owner_number(owner), frame, key))
+
+    def all_notes_off(self, owner, frame=None):
+        self.broadcast((WorkerCommand.ALL_NOTES_OFF, self.owner_number(owner), frame))
+
+    def set_mod_input(self, owner, controller, value, frame=None):
+        self.broadcast((WorkerCommand.MOD_INPUT, self.owner_number(owner), frame, controller, value))
+
+    def broadcast(self, command):
+        # Whichever worker has the owner's notes will act on it
+        for worker in range(self.workers.count):
+            self.inter.send(MessageType.WORKER_COMMAND, worker, command)
+
+    def close(self):
+        """
+        Stop the workers, once the mixer gets round to it. They're waited for and cleaned up
+        by `Mixer.close_retired_workers`.
+        """
+        self.inter.send(MessageType.SET_WORKERS, None)
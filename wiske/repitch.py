@@ -1,34 +1,22 @@
+import numpy as np
 
-import math
+from .interpolation import Interpolation, interpolate
 
 
-def interpolate(a, b, t):
-    # Linear interpolation is good enough
-    return a + (b - a) * t
-
-
-def change_pitch(samples, rate):
+def change_pitch(samples, rate, mode=Interpolation.LINEAR):
     """
     Change the pitch of a samples array, returning a new samples array with the pitch changed.
+    `mode` is one of `Interpolation`.
     """
     LIMIT = (1 << 15) - 1
 
-    index = 0
-    finished = []
-    while index < len(samples) - math.ceil(rate):
-        i = int(index);
-        frac = index - i;
-        s1 = samples[i];
-        s2 = samples[i + math.ceil(rate)];
-        val = int(interpolate(s1, s2, frac))
-
-        # Apply clipping
-        val = max(-LIMIT, min(LIMIT, val))
-
-        finished.append(val)
-        index += rate
+    # Every point but the last has a next point to interpolate towards
+    positions = np.arange(0, len(samples) - 1, rate, dtype=np.float64)
+    values = interpolate(np.asarray(samples), positions, mode)
 
-    return finished
+    # Apply clipping, and truncate like int() does
+    np.clip(values, -LIMIT, LIMIT, out=values)
+    return values.astype(np.int64).tolist()
 
 
 def change_pitch_cents(samples, cents):
@@ -1,9 +1,20 @@
 
 import struct
 
+import numpy as np
+
 
 CACHED_SAMPLES = {}
 
+# Loops unrolled with guard samples, see `unrolled_loop`
+CACHED_LOOPS = {}
+LOOP_CACHE_SIZE = 256
+MIN_LOOP_GUARD = 64
+
+# Stereo pairs, see `stereo_pair`
+CACHED_PAIRS = {}
+PAIR_CACHE_SIZE = 256
+
 
 def data_to_samples(data: bytes, sample_id = None):
     if sample_id is not None and sample_id in CACHED_SAMPLES:
@@ -24,3 +35,64 @@ def samples_to_data(samples: [int]):
         for b in struct.pack("<h", sample):
             data.append(b)
     return bytes(data)
+
+
+def unrolled_loop(sample, offset_s, data, loop_s, loop_e, reach):
+    """
+    Returns a copy of the loop of `data` for notes to play it from, and the position in `data`
+    the copy starts at. The copy leads in with the samples before the end of the loop, followed
+    by a second pass of the loop and then guard samples carrying on from the start of the loop
+    again. Notes move onto it a little before the end of the loop, and play every pass after
+    the first from the second pass, which has the end of the loop before it and its start after
+    it, so that anything up to `reach` samples either side of a position can be read straight
+    off without wrapping. Nothing before the lead in is copied.
+
+    Shared between every note playing the same part of `sample` with the same loop points.
+    `sample` is only used to tell data apart, and may be a pair of samples for stereo data
+    (see `stereo_pair`).
+    """
+    # Round up, so that notes at nearby pitches share the same copy
+    guard = MIN_LOOP_GUARD
+    while guard < reach:
+        guard *= 2
+
+    key = (sample, offset_s, loop_s, loop_e, guard)
+    unrolled = CACHED_LOOPS.get(key)
+    if unrolled is not None:
+        return unrolled
+
+    # The lead in is at least two guards long, so there's a guard's worth either side of where
+    # notes move onto the copy. It starts on a multiple of the guard, which keeps decimated
+    # copies in line with those of the whole sample (see mipmap.py).
+    origin = max(loop_e - 2 * guard, 0) // guard * guard
+
+    # The loop repeats as many times as needed, in case it's shorter than the guard
+    loop_len = max(loop_e - loop_s, 1)
+    repeats = loop_s + np.arange(loop_len + guard) % loop_len
+    copy = np.concatenate((data[origin:loop_e], data.take(repeats, axis=0)))
+
+    if len(CACHED_LOOPS) >= LOOP_CACHE_SIZE:
+        CACHED_LOOPS.clear()
+    unrolled = CACHED_LOOPS[key] = (copy, origin)
+    return unrolled
+
+
+def stereo_pair(left, right):
+    """
+    The data of a linked pair of samples, as a single array of (left, right) frames. Both halves
+    are read with the same indexes, so a stereo note works out its positions once for both.
+    Shared between every note playing the pair.
+    """
+    key = (left, right)
+    pair = CACHED_PAIRS.get(key)
+    if pair is not None:
+        return pair
+
+    # The halves should be the same length, but don't read past the end of either if they aren't
+    length = min(len(left.data), len(right.data))
+    pair = np.stack((left.data[:length], right.data[:length]), axis=1)
+
+    if len(CACHED_PAIRS) >= PAIR_CACHE_SIZE:
+        CACHED_PAIRS.clear()
+    CACHED_PAIRS[key] = pair
+    return pair
@@ -1,5 +1,7 @@
 
-from .decode import decode
+import numpy as np
+
+from .hydra import BAG
 from .definitions import SFGenerator
 from .defaults import SF_GEN_DEFAULTS
 
@@ -14,9 +16,13 @@ class Bag:
 
     @classmethod
     def from_raw(cls, bag, is_preset):
+        return cls.from_record(np.frombuffer(bag, dtype=BAG)[0], is_preset)
+
+    @classmethod
+    def from_record(cls, bag, is_preset):
         # Soundfont 2.01 spec, 7.7
-        gen_ndx = decode.WORD(bag[:2])
-        mod_ndx = decode.WORD(bag[2:4])
+        gen_ndx = int(bag["gen_ndx"])
+        mod_ndx = int(bag["mod_ndx"])
 
         return cls(gen_ndx, mod_ndx, is_preset)
 
@@ -0,0 +1,59 @@
+"""
+Lookup tables for conversions done on every note on and controller change.
+
+Only conversions that are cheaper to look up than to work out have tables. In CPython, finding
+and interpolating a table entry for a single value costs several times more than `2 ** x`, so
+unit conversions like cents to a ratio are left to the formulas in convertors.py.
+"""
+
+from math import log10
+
+from .definitions import SFModType, SFModPolarity, SFModDirection
+
+
+MIDI_RANGE = 128
+
+
+def conx(val):
+    # The shape of the concave and convex curves, for val in [0, 1]
+    return log10(9 * val + 1)
+
+
+def map_unit(val, mod_type, direction):
+    """
+    Map `val` in [0, 1] onto a modulator source curve.
+    """
+    if direction == SFModDirection.negative:
+        val = 1 - val
+    if mod_type == SFModType.concave:
+        return 1 - conx(1 - val)
+    elif mod_type == SFModType.convex:
+        return conx(val)
+    return val
+
+
+def map_controller(val, mod_type, polarity, direction):
+    """
+    Map a controller value from 0 to 127 (which may be fractional, for the pitch wheel) onto a
+    modulator source curve, giving a value in [0, 1] for unipolar sources and [-1, 1] for
+    bipolar ones.
+    """
+    if polarity == SFModPolarity.unipolar:
+        return map_unit(val / 128, mod_type, direction)
+    if val <= 64:
+        return -map_unit((64 - val) / 64, mod_type, direction)
+    return map_unit((val - 64) / 64, mod_type, direction)
+
+
+def build_curves():
+    curves = {}
+    for mod_type in SFModType:
+        for polarity in SFModPolarity:
+            for direction in SFModDirection:
+                curves[(mod_type, polarity, direction)] = tuple(
+                    map_controller(val, mod_type, polarity, direction) for val in range(MIDI_RANGE)
+                )
+    return curves
+
+# (type, polarity, direction): the curve's value at every whole MIDI value
+CURVES = build_curves()
@@ -1,5 +1,5 @@
 
-from math import log2
+from math import log2, cos, sin, pi
 
 
 MIN = -0x7fff
@@ -41,3 +41,19 @@ def decibels_to_atten(db):
         # conventionally inf dB
         return 0
     return 10 ** (-db / 20)
+
+
+def semitones_to_wheel_sens(semitones):
+    # Soundfont 2.01 spec, 8.4.10: the pitch wheel modulator's amount of 12700 cents is meant
+    # to give 100 cents per semitone of sensitivity, but like every other controller
+    # sensitivity is normalised by 128 rather than 127
+    return semitones * 128 / 127
+
+
+def pan_to_gains(pan):
+    """
+    Left and right gains for a pan generator value in 0.1% units, from -500 (fully left) to 500
+    (fully right). Constant power, so a sound keeps the same loudness wherever it's panned.
+    """
+    angle = (min(500, max(-500, pan)) + 500) / 1000 * pi / 2
+    return cos(angle), sin(angle)
@@ -68,7 +68,7 @@ DEFAULT_MODULATORS = [
     # 8.4.4  MIDI Continuous Controller 1 to Vibrato LFO Pitch Depth
     Modulator.from_default_def(0x0081, SFGenerator.vibLfoToPitch, 50, 0x0, 0),
     # 8.4.5  MIDI Continuous Controller 7 to Initial Attenuation
-    Modulator.from_default_def(0x0582, SFGenerator.initialAttenuation, 960, 0x0, 0),
+    Modulator.from_default_def(0x0587, SFGenerator.initialAttenuation, 960, 0x0, 0),
     # 8.4.6  MIDI Continuous Controller 10 to Pan Position
     Modulator.from_default_def(0x028A, SFGenerator.pan, 1000, 0x0, 0),
     # 8.4.7  MIDI Continuous Controller 11 to Initial Attenuation
@@ -78,5 +78,6 @@ DEFAULT_MODULATORS = [
     # 8.4.9  MIDI Continuous Controller 93 to Chorus Effects Send
     Modulator.from_default_def(0x00DD, SFGenerator.chorusEffectsSend, 200, 0x0, 0),
     # 8.4.10  MIDI Pitch Wheel to Initial Pitch Controlled by MIDI Pitch Wheel Sensitivity
-    # Modulator.from_default_def(0x020E, SFGenerator.initialPit, 200, 0x0, 0),
+    # There is no initial pitch generator, so this goes to fine tune, which is added to it
+    Modulator.from_default_def(0x020E, SFGenerator.fineTune, 12700, 0x0010, 0),
 ]
@@ -1,7 +1,9 @@
 
 from ..util.logger import logger
 
-from .decode import decode
+import numpy as np
+
+from .hydra import GEN
 from .definitions import SFGenerator, genAmountType, rangesType, sampleModes, get_gen_amount_type
 
 
@@ -20,8 +22,13 @@ class Generator:
 
     @classmethod
     def from_raw(cls, inst):
+        return cls.from_record(np.frombuffer(inst, dtype=GEN)[0])
+
+    @classmethod
+    def from_record(cls, inst):
         # Soundfont 2.01 spec, 7.9
-        gen_id = decode.WORD(inst[:2])
+        gen_id = int(inst["oper"])
+        raw_val = int(inst["amount"])
         try:
             gen_oper = SFGenerator(gen_id)
         except ValueError:
@@ -31,15 +38,13 @@ class Generator:
         amount = None
         amount_type = get_gen_amount_type(gen_oper)
         if amount_type == genAmountType.SHORT:
-            amount = decode.SHORT(inst[2:4])
+            amount = raw_val - 0x10000 if raw_val & 0x8000 else raw_val
         elif amount_type == genAmountType.rangesType:
-            raw_val = decode.WORD(inst[2:4])
             amount = rangesType(raw_val)
         elif amount_type == genAmountType.sampleModes:
-            raw_val = decode.WORD(inst[2:4])
             amount = sampleModes(raw_val)
         elif amount_type == genAmountType.WORD:
-            amount = decode.WORD(inst[2:4])
+            amount = raw_val
 
         return cls(gen_oper, amount)
 
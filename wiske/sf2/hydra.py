@@ -0,0 +1,72 @@
+import numpy as np
+
+from .exceptions import SoundfontReadException
+
+
+# Record layouts of the hydra (pdta) sub-chunks, so each one can be read in one go as a
+# NumPy structured array. All fields are little endian and packed.
+
+# Soundfont 2.01 spec, 7.2
+PHDR = np.dtype([
+    ("name", "S20"),
+    ("preset", "<u2"),
+    ("bank", "<u2"),
+    ("bag_ndx", "<u2"),
+    ("library", "<u4"),
+    ("genre", "<u4"),
+    ("morphology", "<u4"),
+])
+
+# Soundfont 2.01 spec, 7.3 and 7.7
+BAG = np.dtype([
+    ("gen_ndx", "<u2"),
+    ("mod_ndx", "<u2"),
+])
+
+# Soundfont 2.01 spec, 7.4 and 7.8
+MOD = np.dtype([
+    ("src", "<u2"),
+    ("dest", "<u2"),
+    ("amount", "<i2"),
+    ("amt_src", "<u2"),
+    ("trans", "<u2"),
+])
+
+# Soundfont 2.01 spec, 7.5 and 7.9
+# The amount is kept raw, since whether it's signed depends on the generator.
+GEN = np.dtype([
+    ("oper", "<u2"),
+    ("amount", "<u2"),
+])
+
+# Soundfont 2.01 spec, 7.6
+INST = np.dtype([
+    ("name", "S20"),
+    ("bag_ndx", "<u2"),
+])
+
+# Soundfont 2.01 spec, 7.10
+SHDR = np.dtype([
+    ("name", "S20"),
+    ("start", "<u4"),
+    ("end", "<u4"),
+    ("start_loop", "<u4"),
+    ("end_loop", "<u4"),
+    ("sample_rate", "<u4"),
+    ("pitch", "u1"),
+    ("pitch_correction", "i1"),
+    ("link", "<u2"),
+    ("type", "<u2"),
+])
+
+
+def records(hydra, ident, dtype):
+    """
+    All the records of a hydra sub-chunk as a structured array. This is a view straight onto
+    the chunk's data; nothing is decoded until a field is read.
+    """
+    data = hydra.child(ident).data
+    if len(data) % dtype.itemsize != 0:
+        raise SoundfontReadException("'{}' sub-chunk is invalid length ({})".format(ident, len(data)))
+
+    return np.frombuffer(data, dtype=dtype)
@@ -1,5 +1,8 @@
 
+import numpy as np
+
 from .decode import decode
+from .hydra import INST
 
 
 class Instrument:
@@ -14,9 +17,13 @@ class Instrument:
 
     @classmethod
     def from_raw(cls, inst):
+        return cls.from_record(np.frombuffer(inst, dtype=INST)[0])
+
+    @classmethod
+    def from_record(cls, inst):
         # Soundfont 2.01 spec, 7.6
-        name = decode.ascii_str(inst[:20])
-        bag_ndx = decode.WORD(inst[20:22])
+        name = decode.ascii_str(inst["name"])
+        bag_ndx = int(inst["bag_ndx"])
 
         return cls(name, bag_ndx)
 
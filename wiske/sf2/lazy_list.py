@@ -0,0 +1,36 @@
+class LazyList:
+    """
+    A read-only list whose items are only built, by `build(index)`, the first time they are
+    accessed. Items that build to None are left out when iterating or slicing, but indexes
+    always line up with the records the items are built from.
+    """
+    def __init__(self, size, build):
+        self.build = build
+        self.items = [None] * size
+        self.built = bytearray(size)
+
+    def get(self, index):
+        if not self.built[index]:
+            self.items[index] = self.build(index)
+            self.built[index] = 1
+        return self.items[index]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            items = [self.get(i) for i in range(*index.indices(len(self.items)))]
+            return [x for x in items if x is not None]
+
+        if index < 0:
+            index += len(self.items)
+        if not 0 <= index < len(self.items):
+            raise IndexError("LazyList index out of range")
+        return self.get(index)
+
+    def __iter__(self):
+        for i in range(len(self.items)):
+            item = self.get(i)
+            if item is not None:
+                yield item
@@ -1,5 +1,7 @@
 
-from .decode import decode
+import numpy as np
+
+from .hydra import MOD
 from .sfmodulator import SFModulator
 from .definitions import SFGeneralController, SFGenerator, SFTransform
 
@@ -18,13 +20,17 @@ class Modulator:
 
     @classmethod
     def from_raw(cls, mod):
+        return cls.from_record(np.frombuffer(mod, dtype=MOD)[0])
+
+    @classmethod
+    def from_record(cls, mod):
         # Soundfont 2.01 spec, 8.2
-        mod_src_oper = decode.WORD(mod[:2])
-        mod_dest_oper = decode.WORD(mod[2:4])
-        mod_amount = decode.SHORT(mod[4:6])
+        mod_src_oper = int(mod["src"])
+        mod_dest_oper = int(mod["dest"])
+        mod_amount = int(mod["amount"])
 
-        mod_amt_src_oper = decode.WORD(mod[6:8])
-        mod_trans_oper = decode.WORD(mod[8:10])
+        mod_amt_src_oper = int(mod["amt_src"])
+        mod_trans_oper = int(mod["trans"])
 
         src_oper_real = SFModulator(mod_src_oper)
         amt_src_oper_real = SFModulator(mod_amt_src_oper)
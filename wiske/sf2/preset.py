@@ -1,11 +1,17 @@
 
+import numpy as np
+
 from .decode import decode
+from .hydra import PHDR
 from .defaults import DEFAULT_MODULATORS, SF_GEN_DEFAULTS
 from .definitions import rangesType
+from .zone_index import ZoneIndex, resolve_zone, MIDI_RANGE
 
 
 class Preset:
     bags = None
+    zone_index = None
+    revision = 0
 
     def __init__(self, name, preset_num, bank, bag_ndx):
         self.name = name
@@ -15,17 +21,18 @@ class Preset:
 
     @classmethod
     def from_raw(cls, prst):
+        return cls.from_record(np.frombuffer(prst, dtype=PHDR)[0])
+
+    @classmethod
+    def from_record(cls, prst):
         # Soundfont 2.01 spec, 7.2
-        name = decode.ascii_str(prst[:20])
+        name = decode.ascii_str(prst["name"])
 
-        preset_num = decode.WORD(prst[20:22])
-        bank_num = decode.WORD(prst[22:24])
-        bag_ndx = decode.WORD(prst[24:26])
+        preset_num = int(prst["preset"])
+        bank_num = int(prst["bank"])
+        bag_ndx = int(prst["bag_ndx"])
 
-        # Unused but reserved values, don't read
-        # nop_library = decode.DWORD(prst[26:30])
-        # nop_genre = decode.DWORD(prst[30:34])
-        # nop_morphology = decode.DWORD(prst[30:34])
+        # library, genre and morphology are unused but reserved values, don't read
 
         return cls(name, preset_num, bank_num, bag_ndx)
 
@@ -35,7 +42,36 @@ class Preset:
                 continue
             return bag.instrument(instruments)
 
+    def invalidate(self):
+        """
+        Call after changing anything about this preset or its instruments, so that nothing
+        resolved from the old version of it gets used.
+        """
+        self.zone_index = None
+        self.revision += 1
+
+    def lookup_zone(self, key, vel, instruments, samples):
+        """
+        The `Zone` a note at this key and velocity plays, or None if there isn't one. Uses an
+        index over every key and velocity, built the first time it's needed.
+        """
+        if not (0 <= key < MIDI_RANGE and 0 <= vel < MIDI_RANGE):
+            return resolve_zone(self, key, vel, instruments, samples)
+
+        if self.zone_index is None:
+            self.zone_index = ZoneIndex(self, instruments, samples)
+        return self.zone_index.lookup(key, vel)
+
     def get_gens_and_mods(self, key, vel, inst):
+        inst_bags = [bag for bag in inst.bags if bag.applies_to(key, vel)]
+        preset_bags = [bag for bag in self.bags if bag.applies_to(key, vel)]
+        return self.resolve_gens_and_mods(inst_bags, preset_bags)
+
+    def resolve_gens_and_mods(self, inst_bags, preset_bags):
+        """
+        Combine the generators and modulators of the instrument zones and preset zones that
+        apply to a note.
+        """
         # Init first with defaults
         gens = {}
         for operation in SF_GEN_DEFAULTS:
@@ -43,9 +79,7 @@ class Preset:
 
         # Instrument zones are absolute
         mods = [x for x in DEFAULT_MODULATORS]
-        for bag in inst.bags:
-            if not bag.applies_to(key, vel):
-                continue
+        for bag in inst_bags:
             for gen in bag.gens:
                 gens[gen.operation] = gen.amount
 
@@ -70,9 +104,7 @@ class Preset:
         max_v = 0x7fff
         min_v = -max_v
         preset_mods_global = []
-        for bag in self.bags:
-            if not bag.applies_to(key, vel):
-                continue
+        for bag in preset_bags:
             for gen in bag.gens:
                 if type(gen.amount) == rangesType:
                     continue
@@ -1,68 +1,69 @@
-
+import mmap
 import struct
 
 from .exceptions import RiffReadException
 
-class DataReader:
-    pos = 0
-
-    def __init__(self, data):
-        self.data = data
-        self.maximum = len(data)
 
-    def read_bytes(self, n):
-        if self.pos + n > self.maximum:
-            raise EOFError()
-        data = self.data[self.pos:self.pos+n]
-        self.pos += n
-        return data
+def read_ident(buffer, pos):
+    try:
+        return str(buffer[pos:pos + 4], encoding="ascii")
+    except UnicodeDecodeError:
+        return None
 
 
 class Chunk:
     specific_ident = None
 
-    def __init__(self, ident, length, data):
+    def __init__(self, ident, buffer, offset, length):
+        """
+        The chunk's data is the `length` bytes at `offset` into `buffer`, which is normally
+        a memory mapped file. Only the offsets are kept; the data itself is never copied.
+        """
         self.ident = ident
+        self.buffer = buffer
+        self.offset = offset
         self.length = length
-        self.data = data
         self.children = []
 
         if self.ident in ("RIFF", "LIST"):
             self.read_children()
 
+    @property
+    def data(self):
+        # A memoryview, so slicing it doesn't copy anything either
+        return self.buffer[self.offset:self.offset + self.length]
+
     def read_children(self):
-        child_data = DataReader(self.data)
+        buffer = self.buffer
+        pos = self.offset
+        end = self.offset + self.length
 
         # 4 BYTES - specific identifier for this LIST or RIFF
-        specific_ident = child_data.read_bytes(4)
-        try:
-            self.specific_ident = str(specific_ident, encoding="ascii")
-        except:
+        if pos + 4 > end:
+            raise RiffReadException("Missing specific ident for {}".format(self.chunk_name))
+        self.specific_ident = read_ident(buffer, pos)
+        if self.specific_ident is None:
             raise RiffReadException("Specific ident for {} does not have ASCII encoding ".format(self.chunk_name))
+        pos += 4
 
-        while True:
+        while pos + 8 <= end:
             # 4 BYTES - chunk identifier, ascii string
-            try:
-                ident = child_data.read_bytes(4)
-            except EOFError:
-                break
-
-            try:
-                ident = str(ident, encoding="ascii")
-            except:
+            ident = read_ident(buffer, pos)
+            if ident is None:
                 raise RiffReadException("Chunk ident does not have ASCII encoding, child of {}".format(self.chunk_name))
 
             # 4 BYTES - length, LE unsigned 32-bit int
-            length = child_data.read_bytes(4)
-            length = struct.unpack("<I", length)[0]
+            length = struct.unpack_from("<I", buffer, pos + 4)[0]
+            pos += 8
 
             # length BYTES - chunk data
-            try:
-                new_data = child_data.read_bytes(length)
-            except EOFError:
+            if pos + length > end:
                 raise RiffReadException("Incorrect length for chunk {}, child of {}".format(ident, self.chunk_name))
 
-            self.children.append(Chunk(ident, length, new_data))
+            self.children.append(Chunk(ident, buffer, pos, length))
+
+            # Chunks are padded to an even length
+            pos += length + (length & 1)
 
     def child(self, ident):
         for child in self.children:
@@ -101,34 +102,40 @@ class Chunk:
 
 
 class RiffReader:
+    """
+    Reads the structure of a RIFF file by memory mapping it. Chunk data is left in the
+    mapping, so pages are only read from disk when something actually uses them.
+    """
     def __init__(self, file):
         self.filename = file
-        self.file = None
+        self.map = None
+        self.buffer = None
 
     def read(self):
-        with open(self.filename, "rb") as self.file:
-            return self.read_master_chunk()
+        with open(self.filename, "rb") as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise RiffReadException("File is empty")
+
+        # The mapping stays valid after the file is closed
+        self.buffer = memoryview(self.map)
+        return self.read_master_chunk()
 
     def read_master_chunk(self):
+        if len(self.buffer) < 8:
+            raise RiffReadException("File is too short for a master chunk")
+
         # 4 BYTES - chunk identifier, ascii string
-        ident = self.read_bytes(4)
-        try:
-            ident = str(ident, encoding="ascii")
-        except:
+        ident = read_ident(self.buffer, 0)
+        if ident is None:
             raise RiffReadException("Ident for master chunk is not ASCII")
 
         # 4 BYTES - length, LE unsigned 32-bit int
-        length = self.read_bytes(4)
-        length = struct.unpack("<I", length)[0]
+        length = struct.unpack_from("<I", self.buffer, 4)[0]
 
         # length BYTES - chunk data
-        try:
-            data = self.read_bytes(length)
-        except EOFError:
+        if 8 + length > len(self.buffer):
             raise RiffReadException("Incorrect length for master chunk")
 
-        return Chunk(ident, length, data)
-
-    def read_bytes(self, n):
-        data = self.file.read(n)
-        return data
+        return Chunk(ident, self.buffer, 8, length)
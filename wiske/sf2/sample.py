@@ -1,6 +1,11 @@
 
+import numpy as np
+
+from ..util.logger import logger
+
 from .decode import decode
 from .definitions import SFSampleLink
+from .hydra import SHDR
 
 
 class Sample:
@@ -16,43 +21,62 @@ class Sample:
 
     @classmethod
     def from_raw(cls, smpl, sample_data):
+        return cls.from_record(np.frombuffer(smpl, dtype=SHDR)[0], sample_data)
+
+    @classmethod
+    def from_record(cls, smpl, sample_data):
         # Soundfont 2.01 spec, 7.10
-        name = decode.ascii_str(smpl[:20])
+        name = decode.ascii_str(smpl["name"])
 
         if name == "EOS":
             return None
 
-        start = decode.DWORD(smpl[20:24])
-        end = decode.DWORD(smpl[24:28])
+        start = int(smpl["start"])
+        end = int(smpl["end"])
 
-        data = sample_data[start * 2:end * 2]
+        # A view, not a copy
+        data = sample_data[start:end]
 
-        start_loop = decode.DWORD(smpl[28:32])
-        end_loop = decode.DWORD(smpl[32:36])
+        start_loop = int(smpl["start_loop"])
+        end_loop = int(smpl["end_loop"])
 
         loop = (start_loop - start, end_loop - start)
 
-        sample_rate = decode.DWORD(smpl[36:40])
+        sample_rate = int(smpl["sample_rate"])
         if sample_rate > 50000 or sample_rate < 400:
             logger.warn("Warning: sample {} has unusual sample rate of {}".format(name, sample_rate))
 
-        by_original_pitch = decode.BYTE(smpl[40:41])
-        pitch_correction = decode.CHAR(smpl[41:42])
+        by_original_pitch = int(smpl["pitch"])
+        pitch_correction = int(smpl["pitch_correction"])
 
-        sample_link = decode.WORD(smpl[42:44])
-        sample_type = SFSampleLink(decode.WORD(smpl[44:46]))
+        sample_link = int(smpl["link"])
+        sample_type = SFSampleLink(int(smpl["type"]))
 
         return cls(name, data, loop, sample_rate, by_original_pitch, pitch_correction, sample_type, sample_link)
 
     @property
     def num_samples(self):
         # Works for mono... TODO stereo?
-        return len(self.data) // 2
+        return len(self.data)
 
     @property
     def is_mono(self):
         return self.type == SFSampleLink.monoSample
 
+    @property
+    def is_stereo(self):
+        # One half of a stereo pair, the other half being the sample at `link`
+        return self.type == SFSampleLink.leftSample or self.type == SFSampleLink.rightSample
+
+    @property
+    def is_left(self):
+        return self.type == SFSampleLink.leftSample
+
+    @property
+    def is_rom(self):
+        # Soundfont 2.01 spec, 7.10: ROM samples have the high bit set, and aren't in the file
+        return self.type.value & 0x8000 != 0
+
     def __str__(self):
         return "Sample '{}' of length {:.2f}s ({} samples), looping ({},{}), fs {}Hz, pitch {} ({:+d}), type {}".format(
             self.name, self.num_samples / self.sample_rate, self.num_samples, *self.loop, self.sample_rate, self.pitch, self.pitch_correction, self.type
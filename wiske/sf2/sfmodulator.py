@@ -1,6 +1,7 @@
 
 from ..util.logger import logger
 from .definitions import SFModPolarity, SFModDirection, SFGeneralController, SFModType
+from .conversion_tables import CURVES
 
 
 class SFModulator:
@@ -23,6 +24,9 @@ class SFModulator:
         self.direction = SFModDirection(direction)
         self.type = SFModType(mod_type)
 
+        # What every MIDI value maps to, see `Note.map_midi`
+        self.curve = CURVES[(self.type, self.polarity, self.direction)]
+
         if use_general_cc == 0:
             try:
                 self.controller = SFGeneralController(index)
@@ -1,8 +1,10 @@
 
+import numpy as np
+
 from ..util.logger import logger
 
 from .decode import decode
-from .exceptions import SoundfontException, SoundfontReadException, SoundfontIncompatibleVersion
+from .exceptions import SoundfontException, SoundfontIncompatibleVersion
 from .riff_reader import RiffReader
 from .sample import Sample
 from .instrument import Instrument
@@ -10,35 +12,21 @@ from .bag import Bag
 from .generator import Generator
 from .modulator import Modulator
 from .preset import Preset
-
-
-def records(hydra, ident, size, ignore_terminating = False):
-    data = hydra.child(ident).data
-    if len(data) % size != 0:
-        raise SoundfontReadException("'{}' sub-chunk is invalid length ({})".format(ident, len(data)))
-
-    for i in range(len(data) // size - (1 if ignore_terminating else 0)):
-        yield data[i * size:(i + 1) * size]
+from .hydra import records, PHDR, BAG, MOD, GEN, INST, SHDR
+from .lazy_list import LazyList
 
 
 class Soundfont:
     def __init__(self, file):
         self.reader = RiffReader(file)
-        self.samples = []
-        self.instruments = []
-        self.bags = []
-        self.generators = []
-        self.modulators = []
-        self.presets = []
-        self.preset_bags = []
-        self.preset_gens = []
-        self.preset_mods = []
         try:
             self.chunk = self.reader.read()
             # print(self.chunk)
 
             self.get_metadata()
             self.raw_samples = self.chunk.child("sdta").child("smpl").data
+            # Every sample is a view into this, decoded once here rather than per note
+            self.sample_pool = np.frombuffer(self.raw_samples, dtype="<i2", count=len(self.raw_samples) // 2)
             self.interpret_hydra()
         except SoundfontException as e:
             msg = "Corrupt soundfont: {}".format(e.message)
@@ -58,102 +46,77 @@ class Soundfont:
             return SoundfontIncompatibleVersion("Soundfont version {} is not supported by this synth".format(self.version))
 
 
-    def bake_bags(self):
+    def build_bag(self, bag_records, i, gens, mods, is_preset):
         """
         Since bags and instruments use ids that end at the id of the next bag/instrument,
-        we need to wait until we've read all of them before we can assign references to generators
+        we need the next record as well before we can assign references to generators
         or modulators.
         """
-        for i in range(len(self.bags) - 1):
-            current = self.bags[i]
-            nxt = self.bags[i + 1]
-            current.gens = self.generators[current.gen_ndx:nxt.gen_ndx]
-            current.mods = self.modulators[current.mod_ndx:nxt.mod_ndx]
-
-    def bake_instruments(self):
-        for i in range(len(self.instruments) - 1):
-            current = self.instruments[i]
-            nxt = self.instruments[i + 1]
-            current.bags = self.bags[current.bag_ndx:nxt.bag_ndx]
-
-    def bake_preset_bags(self):
-        for i in range(len(self.preset_bags) - 1):
-            current = self.preset_bags[i]
-            nxt = self.preset_bags[i + 1]
-            current.gens = self.preset_gens[current.gen_ndx:nxt.gen_ndx]
-            current.mods = self.preset_mods[current.mod_ndx:nxt.mod_ndx]
-
-    def bake_presets(self):
-        for i in range(len(self.presets) - 1):
-            current = self.presets[i]
-            nxt = self.presets[i + 1]
-            current.bags = self.preset_bags[current.bag_ndx:nxt.bag_ndx]
+        bag = Bag.from_record(bag_records[i], is_preset)
+        nxt = bag_records[i + 1]
+        bag.gens = gens[bag.gen_ndx:int(nxt["gen_ndx"])]
+        bag.mods = mods[bag.mod_ndx:int(nxt["mod_ndx"])]
+        return bag
+
+    def build_instrument(self, inst_records, i):
+        inst = Instrument.from_record(inst_records[i])
+        inst.bags = self.bags[inst.bag_ndx:int(inst_records[i + 1]["bag_ndx"])]
+        return inst
+
+    def build_preset(self, preset_records, i):
+        preset = Preset.from_record(preset_records[i])
+        preset.bags = self.preset_bags[preset.bag_ndx:int(preset_records[i + 1]["bag_ndx"])]
+        return preset
 
     def interpret_hydra(self):
+        """
+        Every sub-chunk is read in bulk as a structured array, but the objects for its records
+        are only built when something first asks for them. The last record in each sub-chunk
+        only marks where the one before it ends, so it doesn't get an object of its own.
+        """
         hydra = self.chunk.child("pdta")
 
-        # Samples
-        for smpl in records(hydra, "shdr", 46):
-            new_samp = Sample.from_raw(smpl, self.raw_samples)
-            if new_samp is not None:
-                self.samples.append(new_samp)
-
-        # Instrument zone generators
-        for gen in records(hydra, "igen", 4, ignore_terminating=True):
-            new_gen = Generator.from_raw(gen)
-            if new_gen is not None:
-                self.generators.append(new_gen)
-
-        # Instrument zone modulators
-        for mod in records(hydra, "imod", 10, ignore_terminating=True):
-            new_mod = Modulator.from_raw(mod)
-            if new_mod is not None:
-                self.modulators.append(new_mod)
-
-        # Bags (instrument zones)
-        for bag in records(hydra, "ibag", 4):
-            new_bag = Bag.from_raw(bag, False)
-            if new_bag is not None:
-                self.bags.append(new_bag)
-
-        self.bake_bags()
-
-        # Instruments
-        for inst in records(hydra, "inst", 22):
-            new_inst = Instrument.from_raw(inst)
-            if new_inst is not None:
-                self.instruments.append(new_inst)
-
-        self.bake_instruments()
-
-        # Now onto Pxxx headers
-        # Preset zone generators
-        for gen in records(hydra, "pgen", 4, ignore_terminating=True):
-            new_gen = Generator.from_raw(gen)
-            if new_gen is not None:
-                self.preset_gens.append(new_gen)
-
-        # Preset zone modulators
-        for mod in records(hydra, "pmod", 10, ignore_terminating=True):
-            new_mod = Modulator.from_raw(mod)
-            if new_mod is not None:
-                self.preset_mods.append(new_mod)
-
-        # Preset bags
-        for pbag in records(hydra, "pbag", 4):
-            new_pbag = Bag.from_raw(pbag, True)
-            if new_pbag is not None:
-                self.preset_bags.append(new_pbag)
-
-        self.bake_preset_bags()
-
-        # Presets
-        for preset in records(hydra, "phdr", 38):
-            new_preset = Preset.from_raw(preset)
-            if new_preset is not None:
-                self.presets.append(new_preset)
-
-        self.bake_presets()
+        shdr = records(hydra, "shdr", SHDR)
+        igen = records(hydra, "igen", GEN)
+        imod = records(hydra, "imod", MOD)
+        ibag = records(hydra, "ibag", BAG)
+        inst = records(hydra, "inst", INST)
+        pgen = records(hydra, "pgen", GEN)
+        pmod = records(hydra, "pmod", MOD)
+        pbag = records(hydra, "pbag", BAG)
+        phdr = records(hydra, "phdr", PHDR)
+
+        def count(recs):
+            return max(0, len(recs) - 1)
+
+        pool = self.sample_pool
+        self.samples = LazyList(count(shdr), lambda i: Sample.from_record(shdr[i], pool))
+
+        # Instruments, and their zones (bags), generators and modulators
+        self.generators = LazyList(count(igen), lambda i: Generator.from_record(igen[i]))
+        self.modulators = LazyList(count(imod), lambda i: Modulator.from_record(imod[i]))
+        self.bags = LazyList(count(ibag), lambda i: self.build_bag(ibag, i, self.generators, self.modulators, False))
+        self.instruments = LazyList(count(inst), lambda i: self.build_instrument(inst, i))
+
+        # Same again for presets
+        self.preset_gens = LazyList(count(pgen), lambda i: Generator.from_record(pgen[i]))
+        self.preset_mods = LazyList(count(pmod), lambda i: Modulator.from_record(pmod[i]))
+        self.preset_bags = LazyList(count(pbag), lambda i: self.build_bag(pbag, i, self.preset_gens, self.preset_mods, True))
+        self.presets = LazyList(count(phdr), lambda i: self.build_preset(phdr, i))
+        self.preset_index = None
+
+    def find_preset(self, bank, number):
+        """
+        The preset with this bank and number, or None if there isn't one. Looked up in an index
+        that's built the first time it's needed, so this is cheap enough to do on every MIDI
+        program change.
+        """
+        if self.preset_index is None:
+            # If two presets share a bank and number, the first one is used
+            self.preset_index = {}
+            for preset in self.presets:
+                self.preset_index.setdefault((preset.bank, preset.preset_num), preset)
+        return self.preset_index.get((bank, number))
 
     def presets_list_user(self):
         res = ""
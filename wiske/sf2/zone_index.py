@@ -0,0 +1,180 @@
+import numpy as np
+
+from ..util.logger import logger
+
+from .definitions import SFGenerator
+
+
+MIDI_RANGE = 128
+
+
+class Zone:
+    """
+    Everything that applies to a note at a given key and velocity of a preset: the instrument
+    and sample it plays, and the instrument and preset zones (bags) whose generators and
+    modulators apply to it.
+    """
+    def __init__(self, instrument, sample, inst_bags, preset_bags, preset, link_sample=None, link_bag=None):
+        self.instrument = instrument
+        self.sample = sample
+        self.inst_bags = inst_bags
+        self.preset_bags = preset_bags
+        self.preset = preset
+        self.gens = self.mods = None
+
+        # The other half of a stereo sample, and the instrument zone that plays it, if any
+        self.link_sample = link_sample
+        self.link_bag = link_bag
+        self.link = None
+
+    def gens_and_mods(self):
+        """
+        Resolved once per zone, since every note in the zone ends up with the same ones.
+        Callers must not modify what's returned.
+        """
+        if self.gens is None:
+            self.gens, self.mods = self.preset.resolve_gens_and_mods(self.inst_bags, self.preset_bags)
+        return self.gens, self.mods
+
+    def linked(self):
+        """
+        For a zone playing half of a stereo pair, (the other sample, its pan), so that a note can
+        play both halves at once. The pan is what the zone playing the other sample would give
+        it, or the opposite of this zone's if there isn't one. None for anything else.
+        """
+        if self.link_sample is None:
+            return None
+
+        if self.link is None:
+            if self.link_bag is not None:
+                inst_bags = [bag for bag in self.inst_bags if bag.is_global] + [self.link_bag]
+                link_gens, _ = self.preset.resolve_gens_and_mods(inst_bags, self.preset_bags)
+                pan = link_gens[SFGenerator.pan]
+            else:
+                pan = -self.gens_and_mods()[0][SFGenerator.pan]
+            self.link = (self.link_sample, pan)
+        return self.link
+
+
+def range_mask(bag):
+    """
+    Which (key, velocity) pairs a bag applies to, as a 128x128 boolean array.
+    """
+    mask = np.zeros((MIDI_RANGE, MIDI_RANGE), dtype=bool)
+    if bag.is_global:
+        mask[:] = True
+    else:
+        key_range = bag.key_range
+        vel_range = bag.vel_range
+        mask[key_range.byLo:key_range.byHi + 1, vel_range.byLo:vel_range.byHi + 1] = True
+    return mask
+
+
+def zone_bits(bags):
+    """
+    For every (key, velocity), one bit per bag saying whether it applies, packed into bytes.
+    Also returns the index of the first non-global bag that applies, or -1 if none do.
+    """
+    first = np.full((MIDI_RANGE, MIDI_RANGE), -1, dtype=np.int32)
+    if len(bags) == 0:
+        return np.zeros((MIDI_RANGE * MIDI_RANGE, 0), dtype=np.uint8), first
+
+    masks = np.stack([range_mask(bag) for bag in bags])
+
+    # Go backwards, so earlier bags win
+    for n in range(len(bags) - 1, -1, -1):
+        if not bags[n].is_global:
+            first[masks[n]] = n
+
+    bits = np.packbits(masks, axis=0).reshape(-1, MIDI_RANGE * MIDI_RANGE).T
+    return bits, first
+
+
+class ZoneIndex:
+    """
+    Maps every key and velocity of a preset straight to its resolved `Zone`, so that finding
+    what to play for a note is a table lookup rather than a scan through every bag.
+
+    Cells that have the same preset zones, instrument and instrument zones applying to them
+    share a single `Zone`, so only a handful are ever resolved.
+    """
+    def __init__(self, preset, instruments, samples):
+        cells = MIDI_RANGE * MIDI_RANGE
+        preset_bits, preset_first = zone_bits(preset.bags)
+
+        # Which instrument each cell plays
+        inst_ids = np.full((MIDI_RANGE, MIDI_RANGE), -1, dtype=np.int32)
+        for n in np.unique(preset_first):
+            if n >= 0:
+                inst_ids[preset_first == n] = preset.bags[n].gens[-1].amount
+
+        # Which of its instrument's zones apply to each cell. Instruments have different
+        # numbers of zones, so pad everything out to the widest.
+        inst_parts = []
+        for inst_id in np.unique(inst_ids):
+            if inst_id >= 0:
+                inst_parts.append((inst_ids == inst_id, zone_bits(instruments[inst_id].bags)[0]))
+
+        width = max([0] + [bits.shape[1] for _, bits in inst_parts])
+        inst_bits = np.zeros((cells, width), dtype=np.uint8)
+        for cell_mask, bits in inst_parts:
+            inst_bits[cell_mask.reshape(-1), :bits.shape[1]] = bits[cell_mask.reshape(-1)]
+
+        signature = np.concatenate((
+            preset_bits,
+            inst_ids.reshape(-1, 1).view(np.uint8),
+            inst_bits,
+        ), axis=1)
+        _, first_cells, table = np.unique(signature, axis=0, return_index=True, return_inverse=True)
+        self.table = table.reshape(MIDI_RANGE, MIDI_RANGE)
+
+        # Resolve one representative cell for each distinct combination the slow way, so
+        # that the index always agrees with scanning the bags.
+        self.zones = []
+        for cell in first_cells:
+            key, vel = divmod(int(cell), MIDI_RANGE)
+            self.zones.append(resolve_zone(preset, key, vel, instruments, samples))
+
+    def lookup(self, key, vel):
+        return self.zones[self.table[key, vel]]
+
+
+def resolve_zone(preset, key, vel, instruments, samples):
+    """
+    Find the zone for a key and velocity by scanning the bags. Returns None if nothing in the
+    preset plays at this key and velocity.
+    """
+    instrument = preset.get_instrument(key, vel, instruments)
+    if instrument is None:
+        return None
+
+    sample = instrument.get_sample(key, vel, samples)
+    preset_bags = [bag for bag in preset.bags if bag.applies_to(key, vel)]
+
+    # Only the first instrument zone that applies is played, so any others that overlap it
+    # (like the other half of a stereo pair) mustn't add their generators to it
+    inst_bags = [bag for bag in instrument.bags if bag.applies_to(key, vel)]
+    local_bags = [bag for bag in inst_bags if not bag.is_global]
+    inst_bags = [bag for bag in inst_bags if bag.is_global] + local_bags[:1]
+
+    link_sample = link_bag = None
+    if sample is not None and sample.is_stereo:
+        link_sample, link_bag = find_link(sample, local_bags, samples)
+    return Zone(instrument, sample, inst_bags, preset_bags, preset, link_sample, link_bag)
+
+
+def find_link(sample, inst_bags, samples):
+    """
+    The other half of the stereo pair `sample` is in, and the first of `inst_bags` that plays
+    it (or None). If the link doesn't lead to the other half of a pair, `sample` is played on
+    its own, like a mono sample.
+    """
+    link_sample = samples[sample.link] if 0 <= sample.link < len(samples) else None
+    if link_sample is None or not link_sample.is_stereo or link_sample.is_left == sample.is_left:
+        logger.warning("Sample {} has no other half to its stereo pair, playing it as mono".format(sample.name))
+        return None, None
+
+    for bag in inst_bags:
+        if not bag.is_global and bag.gens[-1].amount == sample.link:
+            return link_sample, bag
+    return link_sample, None
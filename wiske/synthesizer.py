@@ -2,6 +2,10 @@
 from .sf2.soundfont import Soundfont
 from .interface import AudioInterface, AudioConfig
 from .instrument import Instrument
+from .channel import Channel, CHANNELS
+from .voice_cache import VoiceCache
+from .voice_pool import VoicePool
+from .parallel import ParallelVoicePool
 
 import sys
 
@@ -9,20 +13,40 @@ class Synthesizer:
     sfont = None
     preset = None
 
-    def __init__(self):
-        cfg = AudioConfig()
+    def __init__(self, sink=None, max_polyphony=64, workers=0):
+        """
+        If `workers` is given, voices are rendered by that many worker processes (see
+        parallel.py), which are started once a soundfont is loaded.
+        """
+        cfg = AudioConfig(sink=sink)
         cfg.period_size = 128
         self.interface = AudioInterface(cfg, max_latency=0.0025)
+        self.voice_cache = VoiceCache()
+        self.max_polyphony = max_polyphony
+        self.workers = workers
+        self.voices = VoicePool(self.interface, max_polyphony)
 
         # Experimental
         sys.setswitchinterval(0.1)
 
     def load_soundfont(self, path):
         self.sfont = Soundfont(path)
+        self.voice_cache.invalidate()
+        if self.workers:
+            # Replaces any workers playing the old soundfont. The mixer only stops them, and
+            # they're waited for here, off the mixing thread, once it has.
+            self.interface.close_retired_workers()
+            self.voices = ParallelVoicePool(self.interface, path, self.workers, self.max_polyphony)
 
     def new_instrument(self, bank, number):
         return Instrument(self, bank, number)
 
+    def new_channels(self, count=CHANNELS):
+        """
+        A set of MIDI channels, see `Channel`.
+        """
+        return [Channel(self, i) for i in range(count)]
+
     def halt(self):
         self.interface.halt()
 
@@ -0,0 +1,44 @@
+from collections import OrderedDict
+
+
+class VoiceCache:
+    """
+    Least recently used cache of fully resolved notes, keyed by preset, key and velocity.
+    Repeated notes spawn from a cached prototype (see `Note.spawn`) rather than going through
+    zone lookup, generator and modulator resolution and unit conversion again.
+
+    Entries remember the revision of their preset, so anything cached before a call to
+    `Preset.invalidate` is ignored and resolved again.
+    """
+    def __init__(self, size=512):
+        self.size = size
+        self.entries = OrderedDict()
+
+    def get(self, preset, key, vel, resolve):
+        """
+        Returns the cached prototype note, or calls `resolve()` to make one if there isn't an
+        up to date one. `resolve` may return None if nothing should play, which is cached too.
+        """
+        cache_key = (preset, key, vel)
+        entry = self.entries.get(cache_key)
+        if entry is not None and entry[0] == preset.revision:
+            self.entries.move_to_end(cache_key)
+            return entry[1]
+
+        prototype = resolve()
+        self.entries[cache_key] = (preset.revision, prototype)
+        self.entries.move_to_end(cache_key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return prototype
+
+    def invalidate(self, preset=None):
+        """
+        Drop everything cached for `preset`, or everything at all if it isn't given.
+        """
+        if preset is None:
+            self.entries.clear()
+            return
+
+        for cache_key in [x for x in self.entries if x[0] is preset]:
+            del self.entries[cache_key]
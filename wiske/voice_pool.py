@@ -0,0 +1,174 @@
+from .note import Note
+from .envelope import Envelope
+from .interface import CustomBuffer
+from .interface.message import MessageType
+
+
+# Not an enum for performance reasons
+class StealPolicy:
+    SAME_KEY = 0            # a voice already playing the same key on the same instrument
+    OLDEST_RELEASED = 1     # the voice that was released longest ago
+    QUIETEST = 2            # the voice with the lowest current level
+
+DEFAULT_STEAL_ORDER = (StealPolicy.SAME_KEY, StealPolicy.OLDEST_RELEASED, StealPolicy.QUIETEST)
+
+
+class Voice:
+    """
+    A slot that plays one note at a time. Its note, envelope and buffer are allocated once and
+    reused for every note played in the slot, and the buffer stays registered with the mixer.
+
+    The note and buffer belong to the mixing thread, and are only changed by `start` and
+    `release` when it handles messages. Everything else is kept by the pool.
+    """
+    def __init__(self, inter):
+        self.inter = inter
+        self.pending = False    # started, but the mixer hasn't got round to it yet
+        self.owner = None
+        self.key = None
+        self.started = 0        # when the current note started, in notes played by the pool
+        self.released = 0       # when the current note was released, or 0 if it hasn't been
+
+        self.buffer = CustomBuffer(False)
+        self.buffer.immortal = True
+        self.buffer.finished = True
+
+        # An empty note, to be filled in from a prototype by `Note.spawn`
+        self.note = Note.__new__(Note)
+        self.note.vol_env = Envelope(0, 0, 0, 0, 0, 0)
+        self.note.last_mod_inputs = {}
+        self.note.cached_modulator_values_raw = {}
+        self.note.buffer = self.buffer
+        self.note.playback = inter.add_custom_buffer(self.buffer, self.note.collect_block)
+
+    def start(self, prototype, mod_inputs=None):
+        prototype.spawn(self.inter, self.note)
+        if mod_inputs:
+            self.note.set_mod_inputs(mod_inputs)
+        self.buffer.looping = self.note.loop is not None
+        self.buffer.finished = False
+        self.pending = False
+
+    def release(self):
+        self.note.stop()
+
+    def set_mod_input(self, controller, value):
+        # Voices that haven't started have no note to change
+        if not self.buffer.finished:
+            self.note.update_mod_input(controller, value)
+
+    @property
+    def free(self):
+        return self.buffer.finished and not self.pending
+
+    @property
+    def level(self):
+        note = self.note
+        return note.vol_env.current_val * note.atten
+
+
+class VoicePool:
+    """
+    A fixed number of voices that notes are played in, which puts a hard limit on how much
+    work a period can take. Once every voice is in use, a new note steals one, chosen by
+    going through `steal_order` (see `StealPolicy`) until one of them finds a voice.
+    """
+    def __init__(self, inter, max_polyphony=64, steal_order=DEFAULT_STEAL_ORDER):
+        self.inter = inter
+        self.steal_order = steal_order
+        self.voices = [Voice(inter) for _ in range(max_polyphony)]
+        self.count = 0
+
+    @property
+    def max_polyphony(self):
+        return len(self.voices)
+
+    def note_on(self, owner, prototype, frame=None, mod_inputs=None):
+        """
+        Start playing a note spawned from `prototype` (see `VoiceCache`), for `owner`, which is
+        usually an `Instrument` or a `Channel`, at `frame` (see `Mixer.send_at`). The note starts
+        with any modulator inputs in `mod_inputs` (see `Note.set_mod_inputs`). Returns the voice
+        it is playing in.
+        """
+        voice = self.find_free()
+        if voice is None:
+            voice = self.steal(owner, prototype.key)
+
+        self.count += 1
+        voice.owner = owner
+        voice.key = prototype.key
+        voice.started = self.count
+        voice.released = 0
+        voice.pending = True
+        self.inter.send_at(frame, MessageType.START_VOICE, voice, prototype, mod_inputs)
+        return voice
+
+    def play(self, owner, instrument, key, vel, frame=None, mod_inputs=None):
+        """
+        Play `key` at `vel` on `instrument` for `owner`, as `note_on` does. Returns the voice it
+        is playing in, or None if the instrument has nothing to play there.
+        """
+        prototype = instrument.prototype(key, vel)
+        if prototype is None:
+            return None
+        return self.note_on(owner, prototype, frame, mod_inputs)
+
+    def note_off(self, owner, key, frame=None):
+        """
+        Release every note that `owner` is playing at `key`, at `frame`.
+        """
+        for voice in self.voices:
+            if voice.owner is owner and voice.key == key and not voice.released and not voice.free:
+                self.count += 1
+                voice.released = self.count
+                self.inter.send_at(frame, MessageType.RELEASE_VOICE, voice)
+
+    def all_notes_off(self, owner, frame=None):
+        """
+        Release every note `owner` is playing.
+        """
+        for voice in self.voices:
+            if voice.owner is owner and not voice.released and not voice.free:
+                self.count += 1
+                voice.released = self.count
+                self.inter.send_at(frame, MessageType.RELEASE_VOICE, voice)
+
+    def set_mod_input(self, owner, controller, value, frame=None):
+        """
+        Change a modulator input, such as a MIDI controller, for every note `owner` is playing.
+        """
+        for voice in self.voices:
+            if voice.owner is owner and not voice.free:
+                self.inter.send_at(frame, MessageType.MOD_INPUT, voice, controller, value)
+
+    def find_free(self):
+        for voice in self.voices:
+            if voice.free:
+                return voice
+        return None
+
+    def steal(self, owner, key):
+        for policy in self.steal_order:
+            if policy == StealPolicy.SAME_KEY:
+                for voice in self.voices:
+                    if voice.owner is owner and voice.key == key:
+                        return voice
+            elif policy == StealPolicy.OLDEST_RELEASED:
+                released = [voice for voice in self.voices if voice.released]
+                if released:
+                    return min(released, key=lambda x: x.released)
+            elif policy == StealPolicy.QUIETEST:
+                # Voices that haven't started yet have no level to go by
+                started = [voice for voice in self.voices if not voice.pending]
+                if started:
+                    return min(started, key=lambda x: x.level)
+
+        # Nothing matched, so take the oldest
+        return min(self.voices, key=lambda x: x.started)
+
+    @property
+    def active(self):
+        """
+        Number of voices currently playing.
+        """
+        return sum(1 for voice in self.voices if not voice.free)